@@ -10,18 +10,26 @@ from functools import wraps
 import bcrypt
 import redis
 import jwt
-from pymongo import MongoClient, UpdateOne, DESCENDING
+from pymongo import MongoClient, UpdateOne, ReplaceOne, IndexModel, ASCENDING, DESCENDING, TEXT, ReturnDocument
 from flask import Flask, Blueprint, Response, request, jsonify, send_file, url_for
 
-from .db.db import connect_db
+from .db import Database
+from .db.db import connect_db, connect_catalog_db
+
+redis_client = redis.Redis(host='localhost', port=6379, db=0)
+
+from .utils.CountCache import CountCache
+
+count_cache = CountCache(redis_client, ttl=int(os.environ.get('COUNT_CACHE_TTL', 60)))
+
 from .middleware.middleware import token_required, admin_token_required
 
 client = connect_db()
 
-db = client['Project']
+db = client[Database]
 
-app = Flask(__name__)
+catalog_db = connect_catalog_db()
 
-redis_client = redis.Redis(host='localhost', port=6379, db=0)
+app = Flask(__name__)
 
 app.config['UPLOAD_FOLDER'] = '/Users/sury/Downloads/projects/Ecommerce/server/app/assets'
@@ -1,6 +1,20 @@
 import os
 from dotenv import load_dotenv
+from .hasher import PasswordHasher
 
 load_dotenv()
 
-secret_key = os.environ.get('SECRET_KEY')
\ No newline at end of file
+secret_key = os.environ.get('SECRET_KEY')
+
+# Every gunicorn worker starts its own pool, so by default the CPUs are split between them
+password_hash_workers = int(os.environ.get(
+    'PASSWORD_HASH_WORKERS',
+    max(1, (os.cpu_count() or 2) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+))
+
+password_hasher = PasswordHasher(
+    workers=password_hash_workers,
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', password_hash_workers * 4)),
+    rounds=int(os.environ.get('BCRYPT_ROUNDS', 12)),
+    timeout=int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+)
@@ -4,8 +4,12 @@ methods for signing in and signing up users.
 """
 
 import uuid
-from . import secret_key
-from .. import Response, json, jsonify, bcrypt, jwt, datetime, timedelta, db
+from . import secret_key, password_hasher
+from .hasher import PasswordHasherBusy
+from .. import Response, jsonify, jwt, datetime, timedelta, db, count_cache
+from ..dashboard.stats import DashboardStats
+from ..user import user_cache
+from ..utils.ResponseEncoder import ResponseEncoder
 
 class Auth:
     """
@@ -42,7 +46,10 @@ class Auth:
         """Authenticates a user and returns a token upon successful sign-in."""
         try:
             user = db.users.find_one({'email': self.email})
-            if user and bcrypt.checkpw(self.password.encode('utf-8'), user.get('password', None)):
+            if user and password_hasher.verify(self.password, user.get('password', None)):
+                if password_hasher.needs_rehash(user['password']):
+                    self.rehash_password(user['password'])
+
                 if user.get('user_account_is_active', True):
                     expires = datetime.utcnow() + timedelta(hours=1)
                     token = jwt.encode({
@@ -64,6 +71,7 @@ class Auth:
                             }
                         }
                     )
+                    user_cache.invalidate(self.email)
 
                     user_data = {
                         "id": user.get("_id", None),
@@ -82,10 +90,11 @@ class Auth:
                         "user": user_data
                     }
 
-                    response_json = json.dumps(response_data, indent=2)
-                    return Response(response_json, mimetype='application/json', status=200)
+                    return ResponseEncoder.json_response(response_data)
                 return jsonify({'message': 'Account is not active!'}), 401
             return jsonify({'message': 'Invalid credentials!'}), 401
+        except PasswordHasherBusy:
+            return Auth.busy_response()
         except Exception:
             return jsonify({'message': 'An error occurred during sign in!'}), 500
 
@@ -99,9 +108,10 @@ class Auth:
         if self.password != self.repeat_password:
             return jsonify({'message': 'Passwords do not match!'}), 401
 
-        password = self.password.encode('utf-8')
-        hashed_password = bcrypt.hashpw(password, bcrypt.gensalt())
-        self.password = hashed_password
+        try:
+            self.password = password_hasher.hash(self.password)
+        except PasswordHasherBusy:
+            return Auth.busy_response()
 
         user_data = {
             "_id": self._id,
@@ -117,4 +127,19 @@ class Auth:
         }
 
         db.users.insert_one(user_data)
+        count_cache.invalidate('users')
+        DashboardStats.record_user_status_change(False, self.user_account_is_active)
         return jsonify({'message': 'User successfully created!'}), 201
+
+    def rehash_password(self, current_hash):
+        """Replaces a hash made with an outdated cost factor, unless the password changed in the meantime."""
+        password_hasher.rehash_in_background(
+            self.password,
+            lambda new_hash: db.users.update_one(
+                {'email': self.email, 'password': current_hash},
+                {'$set': {'password': new_hash}}
+            )
+        )
+
+    def busy_response():
+        return jsonify({'message': 'Server is busy, please try again shortly!'}), 503, {'Retry-After': '1'}
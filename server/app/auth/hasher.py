@@ -0,0 +1,85 @@
+"""
+This module runs bcrypt in a dedicated process pool, so that password hashing
+does not hold the request workers. The number of jobs waiting for the pool is
+bounded: once it is reached, callers get PasswordHasherBusy right away and
+answer 503 instead of queueing behind a login burst.
+"""
+
+from threading import BoundedSemaphore, Lock
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import bcrypt
+
+def hash_password(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def check_password(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=8, rounds=12, timeout=10) -> None:
+        self.workers = workers
+        self.rounds = rounds
+        self.timeout = timeout
+        self.pool = None
+        self._pool_lock = Lock()
+        self.slots = BoundedSemaphore(max_pending)
+
+    def get_pool(self):
+        with self._pool_lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self.pool
+
+    def submit(self, fn, *args):
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self.get_pool().submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, fn, *args):
+        try:
+            return self.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        return self.run(hash_password, password.encode('utf-8'), self.rounds)
+
+    def verify(self, password, hashed):
+        if not hashed:
+            return False
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return self.run(check_password, password.encode('utf-8'), hashed)
+
+    def needs_rehash(self, hashed):
+        """True when hashed was produced with another cost factor than the configured one."""
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        try:
+            return int(hashed.split(b'$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def rehash_in_background(self, password, on_rehashed):
+        """Hashes password with the configured cost and passes the result to on_rehashed, skipped when the pool is busy."""
+        try:
+            future = self.submit(hash_password, password.encode('utf-8'), self.rounds)
+        except PasswordHasherBusy:
+            return
+
+        def done(future):
+            if future.exception():
+                print(f"Could not rehash password: {future.exception()}")
+                return
+            on_rehashed(future.result())
+
+        future.add_done_callback(done)
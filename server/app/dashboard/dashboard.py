@@ -1,6 +1,6 @@
 from decimal import Decimal, ROUND_HALF_UP
-from bson import SON
-from .. import jsonify, db
+from .. import jsonify, datetime
+from .stats import DashboardStats
 
 class Dashboard:
     def __init__(self, user_id, user_is_admin):
@@ -8,68 +8,37 @@ class Dashboard:
         self.user_is_admin = user_is_admin
 
     def get_dashboard_data(self):
+        stats, sales = DashboardStats.get_stats()
+        if stats is None:
+            return jsonify({'message': 'Dashboard statistics are being built, please try again shortly!'}), 503, {'Retry-After': '30'}
+        status_counts = stats.get('status_counts', {})
+
         return jsonify({
-            'total_fulfilled_orders': self.get_number_of_fulfilled_orders(),
-            'total_cancelled_orders': self.get_number_of_cancelled_orders(),
-            'total_revenue': self.get_total_revenue(),
-            'total_active_users': self.get_number_of_active_users(),
-            'sales': self.get_sales(),
+            'total_fulfilled_orders': status_counts.get('Fulfilled', 0),
+            'total_cancelled_orders': status_counts.get('Cancelled', 0),
+            'total_revenue': self.round_revenue(stats.get('total_revenue', 0)),
+            'total_active_users': stats.get('active_users', 0),
+            'sales': [{**month, 'total_sales': self.round_revenue(month['total_sales'])} for month in sales],
         }), 200
 
-    def get_number_of_active_users(self):
-        users = db.users.count_documents({'user_account_is_active': True})
-        return users
-    
-    def get_total_revenue(self):
-        orders = db.orders.find({'status': 'Fulfilled'})
-        total_revenue = 0
-        for order in orders:
-            total_revenue += order['total']
-        return float(Decimal(total_revenue).quantize(Decimal('0.00'), rounding=ROUND_HALF_UP))
-    
-    def get_number_of_fulfilled_orders(self):
-        orders = db.orders.count_documents({'status': 'Fulfilled'})
-        return orders
-    
-    def get_number_of_cancelled_orders(self):
-        orders = db.orders.count_documents({'status': 'Cancelled'})
-        return orders
-
-    def get_sales(self):
-        orders_count = db.orders.count_documents({'status': 'Fulfilled'})
-        if orders_count == 0:
-            return []
+    def get_sales(self, start=None, end=None, granularity='month'):
+        if granularity not in DashboardStats.GRANULARITIES:
+            return jsonify({'message': f"granularity must be one of {', '.join(DashboardStats.GRANULARITIES)}"}), 400
 
-        # Aggregation pipeline
-        pipeline = [
-            {'$match': {'status': 'Fulfilled'}},
-            {'$project': {
-                'formatted_date': {
-                    '$dateFromString': {
-                        'dateString': '$date',
-                        'format': "%Y-%m-%dT%H:%M:%S.%LZ"
-                    }
-                },
-                'total': 1
-            }},
-            {'$project': {
-                'month': {'$dateToString': {'format': "%Y-%m", 'date': "$formatted_date"}},
-                'total': 1
-            }},
-            {'$group': {
-                '_id': '$month',
-                'total_sales': {'$sum': '$total'}
-            }},
-            {'$sort': SON([('_id', 1)])} 
-        ]
+        try:
+            start = datetime.strptime(start, '%Y-%m-%d') if start else None
+            end = datetime.strptime(end, '%Y-%m-%d') if end else None
+        except ValueError:
+            return jsonify({'message': 'from and to must be YYYY-MM-DD dates'}), 400
 
-        aggregated_sales = db.orders.aggregate(pipeline)
+        if start and end and start > end:
+            return jsonify({'message': 'from must not be after to'}), 400
 
-        sales_data = []
-        for month_data in aggregated_sales:
-            sales_data.append({
-                'year_month': month_data['_id'],
-                'total_sales': month_data['total_sales']
-            })
+        sales = DashboardStats.get_sales(start, end, granularity)
+        return jsonify({
+            'granularity': granularity,
+            'sales': [{**period, 'total_sales': self.round_revenue(period['total_sales'])} for period in sales]
+        }), 200
 
-        return sales_data
+    def round_revenue(self, revenue):
+        return float(Decimal(revenue).quantize(Decimal('0.00'), rounding=ROUND_HALF_UP))
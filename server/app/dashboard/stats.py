@@ -0,0 +1,238 @@
+"""
+This module maintains the materialized admin dashboard statistics: a single
+totals document plus daily sales rollups, updated with atomic $inc operations
+from the order and user write paths so that the dashboard reads in O(1) and
+any sales range is answered from the daily buckets instead of the raw orders.
+
+Run `python -m app.dashboard.stats rebuild` from the server directory to
+recompute everything from scratch, or `python -m app.dashboard.stats migrate`
+to convert order dates stored as ISO strings to BSON datetimes first. The
+server also builds the statistics at startup when they were never built; the
+dashboard answers 503 until then.
+
+A rebuild holds a lock document, so only one runs at a time, and computes the
+totals and the daily rollups into fresh documents that replace the live ones.
+Deltas recorded by the write paths between the aggregations and the swap are
+overwritten, which is why rebuilds are an offline repair and not run per request.
+"""
+
+import sys
+import uuid
+from bson import SON
+from pymongo.errors import DuplicateKeyError
+from .. import db, datetime, timedelta
+
+class DashboardStats:
+    STATS_ID = 'totals'
+    LOCK_ID = 'rebuild_lock'
+    LOCK_TTL = 600
+    BUILDING_COLLECTION = 'sales_daily_building'
+    FULFILLED = 'Fulfilled'
+    GRANULARITIES = ('day', 'week', 'month', 'year')
+
+    def record_new_order(order):
+        DashboardStats.record_order_status_change(order, None, order.get('status'))
+
+    def record_order_status_change(order, old_status, new_status):
+        if old_status == new_status:
+            return
+
+        increments = {}
+        if old_status:
+            increments[f'status_counts.{old_status}'] = -1
+        if new_status:
+            increments[f'status_counts.{new_status}'] = 1
+
+        revenue_delta = 0
+        order_delta = 0
+        if new_status == DashboardStats.FULFILLED:
+            revenue_delta, order_delta = order.get('total', 0), 1
+        elif old_status == DashboardStats.FULFILLED:
+            revenue_delta, order_delta = -order.get('total', 0), -1
+
+        if revenue_delta:
+            increments['total_revenue'] = revenue_delta
+
+        db.dashboard_stats.update_one({'_id': DashboardStats.STATS_ID}, {'$inc': increments}, upsert=True)
+
+        day = DashboardStats.get_order_day(order)
+        if order_delta and day:
+            db.sales_daily.update_one(
+                {'_id': day},
+                {'$inc': {'total_sales': revenue_delta, 'order_count': order_delta}},
+                upsert=True
+            )
+
+    def record_user_status_change(was_active, is_active):
+        was_active, is_active = bool(was_active), bool(is_active)
+        if was_active == is_active:
+            return
+        db.dashboard_stats.update_one(
+            {'_id': DashboardStats.STATS_ID},
+            {'$inc': {'active_users': 1 if is_active else -1}},
+            upsert=True
+        )
+
+    def parse_date(date):
+        """Returns a naive UTC datetime for a datetime or an ISO 8601 string, None when it cannot be parsed."""
+        if isinstance(date, str):
+            try:
+                date = datetime.fromisoformat(date.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+        if not isinstance(date, datetime):
+            return None
+        if date.tzinfo:
+            date = (date - date.utcoffset()).replace(tzinfo=None)
+        return date
+
+    def get_order_day(order):
+        date = DashboardStats.parse_date(order.get('date'))
+        return datetime(date.year, date.month, date.day) if date else None
+
+    def get_period(day, granularity):
+        if granularity == 'day':
+            return day.strftime('%Y-%m-%d')
+        if granularity == 'week':
+            year, week, _ = day.isocalendar()
+            return f"{year}-W{week:02d}"
+        if granularity == 'year':
+            return day.strftime('%Y')
+        return day.strftime('%Y-%m')
+
+    def get_stats():
+        """Returns (stats, monthly sales), or (None, []) while the statistics have never been built."""
+        stats = db.dashboard_stats.find_one({'_id': DashboardStats.STATS_ID})
+        if not stats or not stats.get('built'):
+            return None, []
+
+        sales = [
+            {'year_month': month['period'], 'total_sales': month['total_sales']}
+            for month in DashboardStats.get_sales(granularity='month')
+        ]
+        return stats, sales
+
+    def get_sales(start=None, end=None, granularity='month'):
+        """
+        Sums the daily buckets between start and end, both inclusive days, into
+        periods of the given granularity, in chronological order.
+        """
+        query = {'total_sales': {'$gt': 0}}
+        if start or end:
+            query['_id'] = {}
+        if start:
+            query['_id']['$gte'] = start
+        if end:
+            query['_id']['$lt'] = end + timedelta(days=1)
+
+        periods = {}
+        for bucket in db.sales_daily.find(query).sort('_id', 1):
+            period = DashboardStats.get_period(bucket['_id'], granularity)
+            totals = periods.setdefault(period, {'period': period, 'total_sales': 0, 'order_count': 0})
+            totals['total_sales'] += bucket.get('total_sales', 0)
+            totals['order_count'] += bucket.get('order_count', 0)
+        return list(periods.values())
+
+    def ensure_built():
+        """Builds the statistics unless they were already built, meant to run at startup."""
+        stats = db.dashboard_stats.find_one({'_id': DashboardStats.STATS_ID}, {'built': 1})
+        if not stats or not stats.get('built'):
+            DashboardStats.rebuild()
+
+    def acquire_lock():
+        """Returns a token when the rebuild lock was claimed, None while another rebuild holds it."""
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        try:
+            db.dashboard_stats.find_one_and_update(
+                {'_id': DashboardStats.LOCK_ID, 'expires_at': {'$lt': now}},
+                {'$set': {'token': token, 'expires_at': now + timedelta(seconds=DashboardStats.LOCK_TTL)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return token
+
+    def release_lock(token):
+        db.dashboard_stats.delete_one({'_id': DashboardStats.LOCK_ID, 'token': token})
+
+    def rebuild():
+        """
+        Recomputes the totals document and the daily rollups from the raw collections and
+        swaps them in. Returns the new totals, or None when another rebuild is running.
+        """
+        token = DashboardStats.acquire_lock()
+        if not token:
+            print('Dashboard stats rebuild already running')
+            return None
+
+        try:
+            status_counts = {}
+            total_revenue = 0
+            for status in db.orders.aggregate([
+                {'$group': {'_id': '$status', 'count': {'$sum': 1}, 'total': {'$sum': '$total'}}}
+            ]):
+                if not status['_id']:
+                    continue
+                status_counts[status['_id']] = status['count']
+                if status['_id'] == DashboardStats.FULFILLED:
+                    total_revenue = status['total']
+
+            stats = {
+                '_id': DashboardStats.STATS_ID,
+                'status_counts': status_counts,
+                'total_revenue': total_revenue,
+                'active_users': db.users.count_documents({'user_account_is_active': {'$ne': False}}),
+                'built': True
+            }
+
+            db.orders.aggregate([
+                {'$match': {'status': DashboardStats.FULFILLED}},
+                # Orders not migrated yet still store ISO strings, they are parsed here instead of being left out
+                {'$set': {'date': {'$convert': {'input': '$date', 'to': 'date', 'onError': None, 'onNull': None}}}},
+                {'$match': {'date': {'$ne': None}}},
+                {'$group': {
+                    '_id': {'$dateFromParts': {
+                        'year': {'$year': '$date'}, 'month': {'$month': '$date'}, 'day': {'$dayOfMonth': '$date'}
+                    }},
+                    'total_sales': {'$sum': '$total'},
+                    'order_count': {'$sum': 1}
+                }},
+                {'$sort': SON([('_id', 1)])},
+                {'$out': DashboardStats.BUILDING_COLLECTION}
+            ])
+
+            if DashboardStats.BUILDING_COLLECTION in db.list_collection_names():
+                db[DashboardStats.BUILDING_COLLECTION].rename('sales_daily', dropTarget=True)
+            else:
+                db.sales_daily.delete_many({})
+            db.dashboard_stats.replace_one({'_id': DashboardStats.STATS_ID}, stats, upsert=True)
+            return stats
+        finally:
+            DashboardStats.release_lock(token)
+
+    def migrate_order_dates():
+        """Converts order dates stored as ISO strings to BSON datetimes, server side, and returns the count."""
+        result = db.orders.update_many(
+            {'date': {'$type': 'string'}},
+            [{'$set': {'date': {'$dateFromString': {'dateString': '$date', 'onError': '$date'}}}}]
+        )
+        return result.modified_count
+
+def main(argv):
+    if argv[1:] == ['migrate']:
+        print(f"Order dates converted: {DashboardStats.migrate_order_dates()}")
+        argv = [argv[0], 'rebuild']
+
+    if argv[1:] != ['rebuild']:
+        print('Usage: python -m app.dashboard.stats rebuild|migrate')
+        return 1
+
+    stats = DashboardStats.rebuild()
+    if not stats:
+        return 1
+    print(f"Dashboard stats rebuilt: {stats}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -4,4 +4,19 @@ from dotenv import load_dotenv
 load_dotenv()
 
 Username = os.environ.get('MONGO_USERNAME')
-Password = os.environ.get('MONGO_PASSWORD')
\ No newline at end of file
+Password = os.environ.get('MONGO_PASSWORD')
+Uri = os.environ.get('MONGO_URI')
+Database = os.environ.get('MONGO_DATABASE', 'Project')
+
+pool_options = {
+  'maxPoolSize': int(os.environ.get('MONGO_MAX_POOL_SIZE', 50)),
+  'minPoolSize': int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+  'maxIdleTimeMS': int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000)),
+  'waitQueueTimeoutMS': int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+  'connectTimeoutMS': int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+  'socketTimeoutMS': int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 10000)),
+  'serverSelectionTimeoutMS': int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+  'compressors': os.environ.get('MONGO_COMPRESSORS', 'zlib'),
+}
+
+catalog_read_preference = os.environ.get('MONGO_CATALOG_READ_PREFERENCE', 'SECONDARY_PREFERRED').upper()
@@ -0,0 +1,43 @@
+"""
+This module backfills the creation timestamps the product and user listings
+are paginated on. Documents created before the field existed get an ordinal
+in natural (insertion) order, which sorts before every real timestamp, so the
+listings keep showing them in the order they were inserted.
+
+Run `python -m app.db.backfill` from the server directory, then
+`python -m app.db.indexes apply`.
+"""
+
+import sys
+from .. import db, UpdateOne, ASCENDING
+
+class CreatedTimestamps:
+    FIELDS = {'products': 'created_timestamp', 'users': 'account_created_timestamp'}
+    BATCH_SIZE = 1000
+
+    def backfill(collection, field):
+        """Returns the number of documents of collection that were missing field."""
+        missing = db[collection].find({field: {'$exists': False}}, {'_id': 1}).sort('$natural', ASCENDING)
+
+        operations = []
+        backfilled = 0
+        for ordinal, document in enumerate(missing):
+            operations.append(UpdateOne({'_id': document['_id']}, {'$set': {field: ordinal}}))
+            if len(operations) == CreatedTimestamps.BATCH_SIZE:
+                backfilled += db[collection].bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            backfilled += db[collection].bulk_write(operations, ordered=False).modified_count
+        return backfilled
+
+def main(argv):
+    if argv[1:]:
+        print('Usage: python -m app.db.backfill')
+        return 1
+
+    for collection, field in CreatedTimestamps.FIELDS.items():
+        print(f"{collection}: {CreatedTimestamps.backfill(collection, field)} documents backfilled with {field}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
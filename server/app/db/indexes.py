@@ -0,0 +1,128 @@
+"""
+This module declares every index the application relies on, next to the query
+shapes they are meant to serve. The indexes are applied at server startup, and
+the audit explains each query shape and fails on collection scans and on sorts
+that are not backed by an index and not bounded by a limit.
+
+Run `python -m app.db.indexes apply` or `python -m app.db.indexes audit` from
+the server directory.
+"""
+
+import sys
+from pymongo.errors import OperationFailure
+from .. import db, IndexModel, ASCENDING, DESCENDING, TEXT
+
+class IndexRegistry:
+    INDEXES = {
+        'users': [
+            IndexModel([('email', ASCENDING)], name='users_email'),
+            IndexModel([('account_created_timestamp', ASCENDING), ('_id', ASCENDING)], name='users_created')
+        ],
+        'orders': [
+            IndexModel([('userId', ASCENDING), ('date', DESCENDING), ('_id', DESCENDING)], name='orders_user_date'),
+            IndexModel([('date', DESCENDING), ('_id', DESCENDING)], name='orders_date'),
+            IndexModel([('status', ASCENDING)], name='orders_status'),
+            IndexModel([('items._id', ASCENDING), ('userId', ASCENDING)], name='orders_items_user'),
+            IndexModel([('email', ASCENDING)], name='orders_email')
+        ],
+        'wishlist': [
+            IndexModel([('userId', ASCENDING)], name='wishlist_user')
+        ],
+        'products': [
+            IndexModel([('category', ASCENDING), ('created_timestamp', ASCENDING), ('_id', ASCENDING)], name='products_category_created'),
+            IndexModel([('created_timestamp', ASCENDING), ('_id', ASCENDING)], name='products_created'),
+            IndexModel(
+                [('title', TEXT), ('brand', TEXT), ('category', TEXT), ('description', TEXT)],
+                weights={'title': 10, 'brand': 5, 'category': 5, 'description': 1},
+                name='products_text'
+            ),
+            IndexModel([('price', ASCENDING)], name='price_1'),
+            IndexModel([('stock', ASCENDING)], name='stock_1')
+        ],
+        'reviews': [
+            IndexModel([('productId', ASCENDING), ('rating', DESCENDING), ('_id', ASCENDING)], name='productId_1_rating_-1__id_1')
+        ]
+    }
+
+    # (name, collection, filter, sort, limit) for the queries issued on request paths
+    QUERY_SHAPES = [
+        ('auth by email', 'users', {'email': 'audit@example.com'}, None, 1),
+        ('admin users', 'users', {}, [('account_created_timestamp', ASCENDING), ('_id', ASCENDING)], 11),
+        ('user orders', 'orders', {'userId': 'audit'}, [('date', DESCENDING), ('_id', DESCENDING)], 11),
+        ('admin orders', 'orders', {}, [('date', DESCENDING), ('_id', DESCENDING)], 11),
+        ('admin order search', 'orders', {'$or': [{'_id': {'$regex': 'audit', '$options': 'i'}}, {'email': {'$regex': 'audit', '$options': 'i'}}]},
+            [('date', DESCENDING), ('_id', DESCENDING)], 11),
+        ('orders by status', 'orders', {'status': 'Fulfilled'}, None, 0),
+        ('purchase check', 'orders', {'userId': 'audit', 'items._id': 'audit'}, None, 1),
+        ('wishlist', 'wishlist', {'userId': 'audit'}, None, 1),
+        ('products by category', 'products', {'category': 'audit'}, [('created_timestamp', ASCENDING), ('_id', ASCENDING)], 11),
+        ('all products', 'products', {}, [('created_timestamp', ASCENDING), ('_id', ASCENDING)], 11),
+        ('product search', 'products', {'$or': [{'$text': {'$search': 'audit'}}, {'price': 1}, {'stock': 1}]}, None, 10),
+        ('product reviews', 'reviews', {'productId': 'audit'}, [('rating', DESCENDING), ('_id', ASCENDING)], 8)
+    ]
+
+    def apply(*collections):
+        """Creates the registered indexes, for all collections unless some are named."""
+        for collection, indexes in IndexRegistry.INDEXES.items():
+            if collections and collection not in collections:
+                continue
+            try:
+                db[collection].create_indexes(indexes)
+            except OperationFailure as e:
+                print(f"MongoDB error creating indexes on {collection}: {e}")
+
+    def explain(collection, query, sort, limit):
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor.explain()
+
+    def find_problems(plan, problems=None):
+        """Walks the winning plan, rejected plans are skipped, for collection scans and unbounded sorts."""
+        problems = [] if problems is None else problems
+        if isinstance(plan, dict):
+            if plan.get('stage') == 'COLLSCAN':
+                problems.append('COLLSCAN')
+            elif plan.get('stage') == 'SORT' and not plan.get('limitAmount'):
+                problems.append('unbounded in-memory SORT')
+            for key, value in plan.items():
+                if key != 'rejectedPlans':
+                    IndexRegistry.find_problems(value, problems)
+        elif isinstance(plan, list):
+            for value in plan:
+                IndexRegistry.find_problems(value, problems)
+        return problems
+
+    def audit():
+        """Returns {shape name: [problems]} for every query shape that is not served by an index."""
+        failures = {}
+        for name, collection, query, sort, limit in IndexRegistry.QUERY_SHAPES:
+            try:
+                plan = IndexRegistry.explain(collection, query, sort, limit).get('queryPlanner', {})
+                problems = IndexRegistry.find_problems(plan)
+            except OperationFailure as e:
+                problems = [str(e)]
+
+            print(f"{'FAIL' if problems else 'ok':4} {name}: {', '.join(problems) if problems else 'indexed'}")
+            if problems:
+                failures[name] = problems
+        return failures
+
+def main(argv):
+    if argv[1:] == ['apply']:
+        IndexRegistry.apply()
+        print('Indexes applied')
+        return 0
+
+    if argv[1:] == ['audit']:
+        failures = IndexRegistry.audit()
+        print(f"{len(failures)} of {len(IndexRegistry.QUERY_SHAPES)} query shapes are not served by an index")
+        return 1 if failures else 0
+
+    print('Usage: python -m app.db.indexes apply|audit')
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
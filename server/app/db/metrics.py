@@ -0,0 +1,143 @@
+"""
+This module collects connection pool and command metrics through pymongo's
+monitoring listeners, so that the pool can be sized for the worker count.
+"""
+
+import time
+import threading
+from pymongo import monitoring
+from ..metrics.metrics import MONGO_COMMANDS, MONGO_COMMAND_LATENCY, MONGO_POOL_CHECKOUT_WAIT, MONGO_POOL_IN_USE
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks open and in-use connections and how long threads wait to check one out."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_seconds = 0.0
+        self.max_checkout_wait_seconds = 0.0
+        self.pools_cleared = 0
+
+    def _wait_time(self):
+        started = getattr(self._local, 'checkout_started', None)
+        self._local.checkout_started = None
+        return time.monotonic() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.monotonic()
+
+    def connection_checked_out(self, event):
+        wait_time = self._wait_time()
+        MONGO_POOL_CHECKOUT_WAIT.observe(wait_time)
+        MONGO_POOL_IN_USE.inc()
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.checkout_wait_seconds += wait_time
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, wait_time)
+
+    def connection_check_out_failed(self, event):
+        wait_time = self._wait_time()
+        with self._lock:
+            self.checkout_failures += 1
+            self.checkout_wait_seconds += wait_time
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, wait_time)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_IN_USE.dec()
+        with self._lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open_connections': self.open_connections,
+                'in_use': self.in_use,
+                'max_in_use': self.max_in_use,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_checkout_wait_ms': round(self.checkout_wait_seconds * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_checkout_wait_ms': round(self.max_checkout_wait_seconds * 1000, 3),
+                'pools_cleared': self.pools_cleared
+            }
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts commands and their durations by (collection, command name)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = {}
+        self.commands = {}
+
+    @staticmethod
+    def get_collection(event):
+        if event.command_name == 'getMore':
+            return event.command.get('collection')
+        collection = event.command.get(event.command_name)
+        return collection if isinstance(collection, str) else None
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = self.get_collection(event)
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed):
+        with self._lock:
+            collection = self._pending.pop((event.request_id, event.connection_id), None)
+            key = (collection or '', event.command_name)
+            count, total_micros, failures = self.commands.get(key, (0, 0, 0))
+            self.commands[key] = (count + 1, total_micros + event.duration_micros, failures + int(failed))
+
+        MONGO_COMMANDS.labels(*key, 'failed' if failed else 'succeeded').inc()
+        MONGO_COMMAND_LATENCY.labels(*key).observe(event.duration_micros / 1e6)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    'collection': collection,
+                    'command': command,
+                    'count': count,
+                    'failures': failures,
+                    'avg_ms': round(total_micros / count / 1000, 3)
+                }
+                for (collection, command), (count, total_micros, failures) in sorted(self.commands.items())
+            ]
+
+pool_metrics = PoolMetrics()
+command_metrics = CommandMetrics()
@@ -0,0 +1,88 @@
+"""
+This module defines the Prometheus metrics of the application and the /metrics
+rendering. Recording a sample only updates in-process counters, so it is cheap
+enough for the request path. Under gunicorn with several worker processes, set
+PROMETHEUS_MULTIPROC_DIR so that /metrics aggregates all workers.
+
+/metrics requires `Authorization: Bearer <METRICS_TOKEN>`, which Prometheus
+sends with the scrape config's `authorization.credentials`. The client address
+is not used: behind Nginx every request comes from the proxy. Without
+METRICS_TOKEN the route is disabled.
+"""
+
+import os
+import hmac
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest, multiprocess
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latency of the routes blueprint by route', ['method', 'route', 'status']
+)
+
+MONGO_COMMANDS = Counter(
+    'mongo_commands_total', 'MongoDB commands by collection, command and outcome', ['collection', 'command', 'outcome']
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    'mongo_command_duration_seconds', 'MongoDB command durations by collection and command', ['collection', 'command'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time spent waiting for a pooled MongoDB connection',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2)
+)
+MONGO_POOL_IN_USE = Gauge(
+    'mongo_pool_connections_in_use', 'Checked out MongoDB connections', multiprocess_mode='livesum'
+)
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (local_hit, redis_hit, miss)', ['cache', 'result']
+)
+
+SOCKETIO_CONNECTIONS = Gauge(
+    'socketio_connections', 'Connected Socket.IO clients', multiprocess_mode='livesum'
+)
+SOCKETIO_CONNECTS = Counter('socketio_connects_total', 'Socket.IO client connections')
+SOCKETIO_EMITS = Counter('socketio_emits_total', 'Socket.IO events emitted by event', ['event'])
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+class Metrics:
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    def record_status(response):
+        g.response_status = response.status_code
+        return response
+
+    def record_request(exception=None):
+        """Runs on teardown, so that requests whose view raised are recorded as 500s too."""
+        started = g.pop('request_started', None)
+        status = g.pop('response_status', 500)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(request.method, route, status).observe(time.perf_counter() - started)
+
+    def record_cache(cache, local_hits=0, redis_hits=0, misses=0):
+        if local_hits:
+            CACHE_REQUESTS.labels(cache, 'local_hit').inc(local_hits)
+        if redis_hits:
+            CACHE_REQUESTS.labels(cache, 'redis_hit').inc(redis_hits)
+        if misses:
+            CACHE_REQUESTS.labels(cache, 'miss').inc(misses)
+
+    def is_enabled():
+        return bool(METRICS_TOKEN)
+
+    def is_authorized():
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        return scheme == 'Bearer' and hmac.compare_digest(token.encode('utf-8'), METRICS_TOKEN.encode('utf-8'))
+
+    def render():
+        registry = REGISTRY
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -1,10 +1,20 @@
 import os
+from ..db import Database
 from ..db.db import connect_db
+from .. import redis_client
+from .account_cache import AccountStatusCache
 from dotenv import load_dotenv
 
 load_dotenv()
 
 client = connect_db()
-db = client['Project']
+db = client[Database]
 
-secret_key = os.environ.get('SECRET_KEY')
\ No newline at end of file
+secret_key = os.environ.get('SECRET_KEY')
+
+account_status_cache = AccountStatusCache(
+    redis_client,
+    local_ttl=int(os.environ.get('ACCOUNT_CACHE_LOCAL_TTL', 5)),
+    redis_ttl=int(os.environ.get('ACCOUNT_CACHE_REDIS_TTL', 300)),
+    max_size=int(os.environ.get('ACCOUNT_CACHE_MAX_SIZE', 10000))
+)
\ No newline at end of file
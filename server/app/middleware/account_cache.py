@@ -0,0 +1,36 @@
+"""
+This module caches the account status checked by token_required, so that
+authenticated requests do not need a MongoDB round trip to confirm that
+the account is still active.
+"""
+
+from ..utils.TwoTierCache import TwoTierCache
+
+class AccountStatusCache:
+    """
+    Two-tier cache for the user_account_is_active flag. The local layer is kept short
+    lived, Redis holds the shared copy for all workers.
+    """
+
+    KEY_PREFIX = 'account_status'
+
+    def __init__(self, redis_client, local_ttl=5, redis_ttl=300, max_size=10000) -> None:
+        self.cache = TwoTierCache(
+            redis_client, self.KEY_PREFIX, local_ttl=local_ttl, redis_ttl=redis_ttl, max_size=max_size
+        )
+
+    def get(self, email):
+        """Returns the cached account status, or None when the caller has to ask MongoDB."""
+        cached_status = self.cache.get(email)
+        if cached_status is None:
+            return None
+        return cached_status == b'1'
+
+    def set(self, email, is_active):
+        self.cache.set(email, b'1' if is_active else b'0')
+
+    def invalidate(self, *emails):
+        self.cache.invalidate(*emails)
+
+    def stats(self):
+        return self.cache.stats()
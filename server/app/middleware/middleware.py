@@ -1,6 +1,16 @@
-from . import secret_key, db
+from . import secret_key, db, account_status_cache
 from .. import request, jwt, wraps, jsonify
 
+def is_account_active(email):
+    is_active = account_status_cache.get(email)
+    if is_active is None:
+        user_account = db.users.find_one({'email': email}, {'user_account_is_active': 1})
+        if not user_account:
+            return False
+        is_active = user_account.get('user_account_is_active', True)
+        account_status_cache.set(email, is_active)
+    return is_active
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -11,9 +21,7 @@ def token_required(f):
             user_data = jwt.decode(token, secret_key, algorithms=['HS256'])
             email = user_data.get('email')
 
-            user_account = db.users.find_one({'email': email})
-
-            if not user_account or not user_account.get('user_account_is_active', True):
+            if not is_account_active(email):
                 return jsonify({'message': 'Account is not active'}), 401
             
         except jwt.ExpiredSignatureError:
@@ -1,11 +1,21 @@
 import uuid
 import re
 import math
-from .. import jsonify, db, UpdateOne, DESCENDING
+from pymongo.errors import PyMongoError
+from .. import jsonify, db, count_cache, datetime, UpdateOne, DESCENDING, ReturnDocument
 from ..product.product import Product
+from ..product.cache import ProductCache
+from ..product import product_cache
 from ..user.user import User
+from ..dashboard.stats import DashboardStats
+from ..utils.KeysetPagination import KeysetPagination
+from ..utils.Projection import Projection
+from .stock import aggregate_quantities, reserve_stock, release_stock
 
 class Order:
+    pagination = KeysetPagination([('date', DESCENDING), ('_id', DESCENDING)])
+    LIST_FIELDS = ('userId', 'email', 'status', 'total', 'date', 'items._id', 'items.quantity')
+
     def __init__(self, order = {}, _id = None, user_id = None) -> None:
         self.order = order
         self._id = _id if _id else str(uuid.uuid4())
@@ -15,50 +25,65 @@ class Order:
             self.order['_id'] = str(uuid.uuid4())
     
     def add_order(self):
-        order_id = db.orders.insert_one(self.order).inserted_id
+        try:
+            quantities = aggregate_quantities(self.order.get('items', []))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'message': 'Invalid order items'}), 400
+
+        unavailable_ids = reserve_stock(db.products, quantities, reservation_id=self.order['_id'])
+        if unavailable_ids:
+            available = {
+                product['_id']: product.get('stock', 0)
+                for product in db.products.find({'_id': {'$in': unavailable_ids}}, {'stock': 1})
+            }
+            return jsonify({
+                'message': 'Some items cannot be fulfilled',
+                'unavailable_items': [
+                    {'_id': product_id, 'requested': quantities[product_id], 'available': available.get(product_id, 0)}
+                    for product_id in unavailable_ids
+                ]
+            }), 409
+
+        self.order['date'] = DashboardStats.parse_date(self.order.get('date')) or datetime.utcnow()
+
+        try:
+            order_id = db.orders.insert_one(self.order).inserted_id
+        except PyMongoError:
+            order_id = None
 
         if not order_id:
+            release_stock(db.products, quantities)
             return jsonify({'message': 'Something went wrong...'}), 500
 
-        updates = {}
-        for item in self.order.get('items', []):
-            product_id = item['_id']
-            quantity_ordered = item['quantity']
-            updates[product_id] = updates.get(product_id, 0) + quantity_ordered
+        DashboardStats.record_new_order(self.order)
+        count_cache.invalidate('orders')
+        product_cache.invalidate(*[ProductCache.product_tag(product_id) for product_id in quantities])
 
-        product_ids = list(updates.keys())
-        products = {p['_id']: p for p in db.products.find({'_id': {'$in': product_ids}})}
-
-        bulk_operations = []
-        for product_id, quantity_ordered in updates.items():
-            product = products.get(product_id)
-            if product:
-                new_quantity = int(product['stock']) - quantity_ordered
-                bulk_operations.append(
-                    UpdateOne({'_id': product_id}, {'$set': {'stock': new_quantity}})
-                )
+        return jsonify({"_id": order_id}), 200
 
-        if bulk_operations:
-            db.products.bulk_write(bulk_operations)
+    def list_projection(fields):
+        """The pagination sort keys are always projected, the next cursor is built from them."""
+        return Projection.build(
+            Projection.parse_fields(fields, Order.LIST_FIELDS),
+            required=[field for field, _ in Order.pagination.sort_fields]
+        )
 
-        return jsonify({"_id": order_id}), 200
-    
-    def get_orders(self, order_id=None, page=1, limit=4):
+    def get_orders(self, order_id=None, page=1, limit=4, cursor=None, fields=None):
         if order_id:
             orders = db.orders.find_one({'_id': order_id})
             if orders:
                 return orders
             return jsonify({'message': 'Order not found'}), 404
 
-        skip = (page - 1) * limit
-        orders_cursor = db.orders.find({'userId': self.user_id}).sort('date', DESCENDING).skip(skip).limit(limit)
-        orders_list = list(orders_cursor)
-
-        total_orders = db.orders.count_documents({'userId': self.user_id})
-        next_page_available = total_orders > (skip + limit)
+        try:
+            orders_list, next_cursor = self.pagination.fetch(
+                db.orders, {'userId': self.user_id}, limit, cursor=cursor, page=page, projection=Order.list_projection(fields)
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
 
         if orders_list:
-            return jsonify({'orders': orders_list, 'next_page_available': next_page_available}), 200
+            return jsonify({'orders': orders_list, 'next_page_available': next_cursor is not None, 'next_cursor': next_cursor}), 200
         else:
             return jsonify({'message': 'No orders found'}), 404
         
@@ -67,14 +92,20 @@ class Order:
         if order:
             return jsonify({'message': True }), 200
         return jsonify({'message': False }), 200
+
+    def have_user_purchased_products(self, product_ids):
+        """Returns {productId: bool} for product_ids with a single distinct over the user's orders."""
+        purchased = set(db.orders.distinct('items._id', {'userId': self.user_id, 'items._id': {'$in': product_ids}}))
+        return jsonify({'products': {product_id: product_id in purchased for product_id in product_ids}}), 200
     
     def update_order(self, status):
-        order = db.orders.find_one({'_id': self._id})
+        order = db.orders.find_one_and_update(
+            {'_id': self._id},
+            {'$set': {'status': status}},
+            return_document=ReturnDocument.BEFORE
+        )
         if order:
-            db.orders.update_one(
-                {'_id': self._id},
-                {'$set': {'status': status}}
-            )
+            DashboardStats.record_order_status_change(order, order.get('status'), status)
 
             bulk_operations = []
             for item in order.get('items', []):
@@ -86,6 +117,7 @@ class Order:
 
             if bulk_operations:
                 db.products.bulk_write(bulk_operations)
+                product_cache.invalidate(*[ProductCache.product_tag(item.get('_id')) for item in order.get('items', [])])
 
             return jsonify({'message': 'Success!'}), 200
         else:
@@ -96,23 +128,32 @@ class Order:
         user_id = data.get('userId', None)
         order = db.orders.find_one({'_id': order_id})
 
+        if not order:
+            return {'error': 'Order not found'}
+
         if order.get('userId', None) != user_id and not User.user_is_admin(userId=user_id):
             return {'error': 'Unauthorized access!'}
 
-        if order and 'items' in order:
-            product_details = [Product.get_product_details(item['_id']) for item in order['items']]
-            updated_items = [{**item, **details} for item, details in zip(order['items'], product_details)]
-            order['items'] = updated_items
+        return Order.hydrate_order(order)
+
+    def get_order_details(order_id):
+        order = db.orders.find_one({'_id': order_id})
+        if not order:
+            return None
+        return Order.hydrate_order(order)
+
+    def hydrate_order(order):
+        if 'items' in order:
+            product_summaries = Product.get_product_summaries([item['_id'] for item in order['items']])
+            order['items'] = [{**item, **product_summaries.get(item['_id'], {})} for item in order['items']]
 
         return order
     
-    def get_all_orders(search_term, page, limit=10):
-        skip = limit * (page - 1)
-
+    def get_all_orders(search_term, page, limit=10, cursor=None, fields=None):
         search_query = {}
 
-        if search_term:
-            regex_pattern = re.compile(f'.*{re.escape(search_term)}.*', re.IGNORECASE)
+        if search_term and search_term.strip():
+            regex_pattern = re.compile(f'.*{re.escape(search_term.strip().lower())}.*', re.IGNORECASE)
 
             search_query = {
                 "$or": [
@@ -121,10 +162,11 @@ class Order:
                 ]
             }
 
-        orders = db.orders.find(search_query).skip(skip).limit(limit).sort('date', DESCENDING)
-        orders_list = list(orders)
+        orders_list, next_cursor = Order.pagination.fetch(
+            db.orders, search_query, limit, cursor=cursor, page=page or 1, projection=Order.list_projection(fields)
+        )
 
-        total_count = db.orders.count_documents(search_query)
+        total_count = count_cache.count(db.orders, search_query)
         total_pages = math.ceil(total_count / limit)
 
-        return {'orders': orders_list, 'total_pages': total_pages}
+        return {'orders': orders_list, 'total_pages': total_pages, 'next_cursor': next_cursor}
@@ -0,0 +1,75 @@
+"""
+This module reserves product stock for an order in a single acknowledged round
+trip. Each line item is a conditional $inc guarded by stock >= quantity, and
+all of them are sent in one unordered bulk_write, so concurrent orders for the
+same product can never oversell it. Unknown product ids simply do not match:
+nothing is ever written for them.
+
+Every guarded update also pushes the reservation id onto the product. When
+fewer lines matched than were sent, the products carrying that id are the lines
+that succeeded, and only those are released. On success the ids are pulled
+again with an unacknowledged write that the caller does not wait for.
+
+It only depends on pymongo, so that benchmarks/order_stock.py can load it
+against a local mongod.
+"""
+
+import uuid
+from pymongo import UpdateOne, WriteConcern
+
+RESERVATIONS_FIELD = 'stock_reservations'
+
+def aggregate_quantities(items):
+    """Sums the ordered quantity per product id, raises ValueError for non positive quantities."""
+    quantities = {}
+    for item in items:
+        quantity = int(item['quantity'])
+        if quantity <= 0:
+            raise ValueError(f"Invalid quantity for product {item['_id']}")
+        quantities[item['_id']] = quantities.get(item['_id'], 0) + quantity
+    return quantities
+
+def reserve_stock(products, quantities, reservation_id=None):
+    """
+    Decrements stock for every product in quantities and returns the ids that could
+    not be fulfilled. When any item fails, the items that did succeed are released again.
+    """
+    if not quantities:
+        return []
+
+    reservation_id = reservation_id or str(uuid.uuid4())
+    result = products.bulk_write([
+        UpdateOne(
+            {'_id': product_id, 'stock': {'$gte': quantity}},
+            {'$inc': {'stock': -quantity}, '$push': {RESERVATIONS_FIELD: reservation_id}}
+        )
+        for product_id, quantity in quantities.items()
+    ], ordered=False)
+
+    if result.matched_count == len(quantities):
+        products.with_options(write_concern=WriteConcern(w=0)).update_many(
+            {'_id': {'$in': list(quantities)}},
+            {'$pull': {RESERVATIONS_FIELD: reservation_id}}
+        )
+        return []
+
+    reserved_ids = {
+        product['_id']
+        for product in products.find({'_id': {'$in': list(quantities)}, RESERVATIONS_FIELD: reservation_id}, {'_id': 1})
+    }
+    release_stock(
+        products,
+        {product_id: quantity for product_id, quantity in quantities.items() if product_id in reserved_ids},
+        reservation_id
+    )
+    return [product_id for product_id in quantities if product_id not in reserved_ids]
+
+def release_stock(products, quantities, reservation_id=None):
+    if quantities:
+        products.bulk_write([
+            UpdateOne(
+                {'_id': product_id},
+                {'$inc': {'stock': quantity}, **({'$pull': {RESERVATIONS_FIELD: reservation_id}} if reservation_id else {})}
+            )
+            for product_id, quantity in quantities.items()
+        ], ordered=False)
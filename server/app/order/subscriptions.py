@@ -0,0 +1,68 @@
+from threading import Lock
+
+class OrderSubscriptions:
+    """
+    Keeps track of which Socket.IO clients are watching which orders, so that
+    change-stream events are only routed to the rooms that asked for them.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._order_sids = {}
+        self._sid_orders = {}
+        self._order_list_sids = {}
+
+    @staticmethod
+    def order_room(order_id):
+        return f"order:{order_id}"
+
+    def subscribe_order(self, sid, order_id):
+        """
+        Registers a client that has already been authorized to follow the order.
+        A client follows one order at a time, so the orders it followed before are
+        returned for the caller to leave their rooms.
+        """
+        with self._lock:
+            previous_order_ids = self._sid_orders.get(sid, set()) - {order_id}
+            for previous_order_id in previous_order_ids:
+                self._discard_order_sid(previous_order_id, sid)
+            self._order_sids.setdefault(order_id, set()).add(sid)
+            self._sid_orders[sid] = {order_id}
+        return previous_order_ids
+
+    def subscribe_order_list(self, sid, search_term, page):
+        with self._lock:
+            self._order_list_sids[sid] = (search_term, page)
+
+    def has_order_subscribers(self, order_id):
+        with self._lock:
+            return bool(self._order_sids.get(order_id))
+
+    def order_list_groups(self):
+        """Groups order list subscribers by (search_term, page), so each page is queried once."""
+        groups = {}
+        with self._lock:
+            for sid, key in self._order_list_sids.items():
+                groups.setdefault(key, []).append(sid)
+        return groups
+
+    def unsubscribe(self, sid):
+        with self._lock:
+            for order_id in self._sid_orders.pop(sid, set()):
+                self._discard_order_sid(order_id, sid)
+            self._order_list_sids.pop(sid, None)
+
+    def _discard_order_sid(self, order_id, sid):
+        """Must be called with the lock held."""
+        sids = self._order_sids.get(order_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self._order_sids[order_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'orders': len(self._order_sids),
+                'order_list_subscribers': len(self._order_list_sids)
+            }
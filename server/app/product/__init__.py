@@ -0,0 +1,15 @@
+import os
+from .. import redis_client
+from .cache import ProductCache
+from ..utils.LRUCache import LRUCache
+
+product_cache = ProductCache(
+    redis_client,
+    local_ttl=int(os.environ.get('PRODUCT_LOCAL_CACHE_TTL', 5)),
+    local_max_size=int(os.environ.get('PRODUCT_LOCAL_CACHE_SIZE', 256))
+)
+
+product_summary_cache = LRUCache(
+    max_size=int(os.environ.get('PRODUCT_SUMMARY_CACHE_SIZE', 5000)),
+    ttl=int(os.environ.get('PRODUCT_SUMMARY_CACHE_TTL', 300))
+)
@@ -0,0 +1,148 @@
+"""
+This module implements the Redis cache for product pages. Every cached page is
+registered under tags (product:{id}, category:{name}) that the write paths
+invalidate, and rebuilding a missing page is single-flighted with a Redis lock
+so that an expired hot key only sends one request to MongoDB. The hottest pages
+are also kept for a few seconds in a process-local layer, so they are served
+without a Redis round trip.
+
+Invalidations stamp each tag with a version drawn from a global counter. A
+rebuilt page is only stored when none of its tags was stamped after the build
+started, so a write only discards the in-flight rebuilds that it affects.
+"""
+
+import time
+import uuid
+import hashlib
+from redis.exceptions import WatchError
+from ..utils.TwoTierCache import TwoTierCache
+from ..metrics.metrics import Metrics
+
+class ProductCache:
+    TAG_PREFIX = 'product_tags'
+    LOCK_PREFIX = 'product_locks'
+    ETAG_PREFIX = 'product_etags'
+    VERSION_PREFIX = 'product_tag_versions'
+    EMPTY_PREFIX = 'product_empty'
+    GENERATION_KEY = 'product_cache:generation'
+    VERSION_TTL = 3600
+
+    def __init__(self, redis_client, lock_timeout=5, wait_timeout=2, wait_interval=0.05, local_ttl=5, local_max_size=256) -> None:
+        self.redis_client = redis_client
+        self.pages = TwoTierCache(redis_client, 'products', local_ttl=local_ttl, max_size=local_max_size)
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.wait_interval = wait_interval
+
+    @staticmethod
+    def product_tag(product_id):
+        return f"product:{product_id}"
+
+    @staticmethod
+    def category_tag(category):
+        return f"category:{category if category else 'all'}"
+
+    @staticmethod
+    def generate_etag(data):
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, key):
+        """Returns (payload, etag), the content hash is stored next to the cached payload."""
+        cached = self.pages.get_local(key)
+        if cached:
+            return cached
+
+        cached_data, etag = self.redis_client.mget(key, f"{self.ETAG_PREFIX}:{key}")
+        if not cached_data:
+            Metrics.record_cache('products', misses=1)
+            return None, None
+
+        Metrics.record_cache('products', redis_hits=1)
+        etag = etag.decode('utf-8') if etag else self.generate_etag(cached_data)
+        self.pages.set_local(key, (cached_data, etag))
+        return cached_data, etag
+
+    def get_or_build(self, key, build, ttl):
+        """
+        Returns (payload, etag) for key, rebuilding the payload with build(), which returns
+        (payload, tags), when it is not cached. Only the worker holding the lock rebuilds,
+        the others wait for its result and only fall back to building themselves on timeout.
+        When the build finds nothing, a marker living wait_timeout seconds stops the waiters.
+        """
+        cached_data, etag = self.get(key)
+        if cached_data:
+            return cached_data, etag
+
+        lock_key = f"{self.LOCK_PREFIX}:{key}"
+        empty_key = f"{self.EMPTY_PREFIX}:{key}"
+        lock_token = str(uuid.uuid4())
+
+        if not self.redis_client.set(lock_key, lock_token, nx=True, ex=self.lock_timeout):
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                cached_data, etag = self.get(key)
+                if cached_data:
+                    return cached_data, etag
+                if self.redis_client.exists(empty_key):
+                    return None, None
+            lock_token = None
+
+        try:
+            generation = int(self.redis_client.get(self.GENERATION_KEY) or 0)
+            data, tags = build()
+            if not data:
+                self.redis_client.set(empty_key, 1, ex=max(1, int(self.wait_timeout)))
+                return None, None
+
+            etag = self.generate_etag(data)
+            self.set(key, data, etag, tags, ttl, generation)
+            return data, etag
+        finally:
+            if lock_token and self.redis_client.get(lock_key) == lock_token.encode('utf-8'):
+                self.redis_client.delete(lock_key)
+
+    def set(self, key, data, etag, tags, ttl, generation):
+        """Stores data unless one of its tags was invalidated after generation was read."""
+        version_keys = [f"{self.VERSION_PREFIX}:{tag}" for tag in tags]
+        with self.redis_client.pipeline() as pipe:
+            try:
+                if version_keys:
+                    pipe.watch(*version_keys)
+                    if any(int(version or 0) > generation for version in pipe.mget(version_keys)):
+                        pipe.unwatch()
+                        return
+
+                pipe.multi()
+                pipe.setex(key, ttl, data)
+                pipe.setex(f"{self.ETAG_PREFIX}:{key}", ttl, etag)
+                for tag in tags:
+                    tag_key = f"{self.TAG_PREFIX}:{tag}"
+                    pipe.sadd(tag_key, key)
+                    pipe.expire(tag_key, ttl)
+                pipe.execute()
+            except WatchError:
+                pass
+
+    def invalidate(self, *tags):
+        """
+        Stamps the tags with a new version before reading their pages: a rebuild either
+        registered its page in time to be deleted here, or sees the new version and skips.
+        """
+        if not tags:
+            return
+        tag_keys = [f"{self.TAG_PREFIX}:{tag}" for tag in tags]
+
+        version = self.redis_client.incr(self.GENERATION_KEY)
+        with self.redis_client.pipeline() as pipe:
+            for tag in tags:
+                pipe.set(f"{self.VERSION_PREFIX}:{tag}", version, ex=self.VERSION_TTL)
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            results = pipe.execute()
+
+        page_keys = {member.decode('utf-8') for members in results[len(tags):] for member in members}
+        etag_keys = [f"{self.ETAG_PREFIX}:{page_key}" for page_key in page_keys]
+
+        self.redis_client.delete(*page_keys, *etag_keys, *tag_keys)
+        self.pages.invalidate_local(*page_keys)
@@ -1,10 +1,27 @@
 import uuid
 import math
-import re
-from decimal import Decimal, ROUND_HALF_UP
-from .. import Response, json, jsonify, db, redis_client
+from .. import Response, jsonify, db, count_cache, datetime, ASCENDING
+from ..utils.ResponseEncoder import ResponseEncoder
+from ..utils.KeysetPagination import KeysetPagination
+from ..utils.Projection import Projection
+from .reviews import Review
+from .cache import ProductCache
+from ..order.stock import RESERVATIONS_FIELD
+from . import product_cache, product_summary_cache
 
 class Product:
+    # Creation order, _id is a uuid4 and only breaks ties
+    pagination = KeysetPagination([('created_timestamp', ASCENDING), ('_id', ASCENDING)])
+    REVIEW_FIELDS = ('reviews', 'review_count', 'rating_sum', 'average_rating')
+    # The product form fields; the rest of the detail payload the form is filled from is never written back
+    EDITABLE_FIELDS = ('title', 'description', 'category', 'price', 'discount_percentage', 'stock', 'brand', 'thumbnail')
+    CACHE_VERSION = 'v4'
+    CACHE_CONTROL = 'public, no-cache'
+    PRODUCT_CACHE_TTL = 3600
+    CATEGORY_CACHE_TTL = 3600
+    SUMMARY_FIELDS = ('title', 'brand', 'category', 'price', 'discount_percentage', 'thumbnail')
+    LIST_FIELDS = ('title', 'brand', 'category', 'price', 'discount_percentage', 'stock', 'thumbnail', 'review_count', 'average_rating')
+
     def __init__(self, product={}, category=None, productId=None) -> None:
         self.product = product
         self.category = category
@@ -14,8 +31,17 @@ class Product:
             self.product['_id'] = str(uuid.uuid4())
 
     def add_product(self) -> Response:
+        for field in self.REVIEW_FIELDS:
+            self.product.pop(field, None)
+        self.product.update({'review_count': 0, 'rating_sum': 0, 'created_timestamp': int(datetime.utcnow().timestamp())})
+
         added_product = db.products.insert_one(self.product)
         if added_product:
+            count_cache.invalidate('products')
+            product_cache.invalidate(
+                ProductCache.category_tag(self.product.get('category')),
+                ProductCache.category_tag(None)
+            )
             return jsonify({'message': 'Product added!'}), 200 
         return jsonify({'message': 'Something went wrong...'}), 500
     
@@ -23,163 +49,211 @@ class Product:
         product = db.products.find_one({'_id': product_id})
         return product if product else None
 
-    def get_product(self, page, limit=10) -> Response:
+    def get_product_summaries(product_ids):
+        """
+        Returns {product_id: summary} with the fields order items display. Misses in the
+        process-local cache are fetched with a single $in query, from the primary so that
+        a lagging secondary cannot put a stale summary back after an invalidation.
+        """
+        summaries = product_summary_cache.get_many(product_ids)
+        missing_ids = [product_id for product_id in set(product_ids) if product_id not in summaries]
+
+        if missing_ids:
+            projection = {field: 1 for field in Product.SUMMARY_FIELDS}
+            for product in db.products.find({'_id': {'$in': missing_ids}}, projection):
+                product_summary_cache.set(product['_id'], product)
+                summaries[product['_id']] = product
+
+        return summaries
+
+    def invalidate_product_summary(change):
+        """Drops the cached summary of a product when a change-stream event touches its summary fields."""
+        if change['operationType'] == 'update':
+            updated_fields = change.get('updateDescription', {}).get('updatedFields', {})
+            removed_fields = change.get('updateDescription', {}).get('removedFields', [])
+            changed_fields = {field.split('.')[0] for field in [*updated_fields, *removed_fields]}
+            if not changed_fields.intersection(Product.SUMMARY_FIELDS):
+                return
+        product_summary_cache.delete(change['documentKey']['_id'])
+
+    def get_product(self, page, limit=10, cursor=None, fields=None) -> Response:
         if self.productId:
-            return self.get_single_product(page, limit=7)
-        return self.get_product_category_list(page, limit)
-
-    def get_single_product(self, page, limit=2):
-        redis_key = self.generate_redis_key(self.productId, page, limit)
-
-        cached_product = self.get_cached_products(redis_key)
-        if cached_product:
-            return self.create_response(cached_product)
-
-        product = db.products.find_one({'_id': self.productId})
-        if product:
-            reviews = product.get('reviews', [])
+            return self.get_single_product(page, limit=7, cursor=cursor)
+        return self.get_product_category_list(page, limit, cursor, Product.parse_list_fields(fields))
+
+    def parse_list_fields(fields):
+        return Projection.parse_fields(fields, Product.LIST_FIELDS, excluded=('reviews',))
+
+    def list_projection(fields):
+        """
+        average_rating is not stored, it is derived from the review aggregates. The
+        pagination sort keys are always projected, the next cursor is built from them.
+        """
+        projection = Projection.build((field for field in fields if field != 'average_rating'), required=('created_timestamp',))
+        if 'average_rating' in fields:
+            projection.update({'review_count': 1, 'rating_sum': 1})
+        return projection
+
+    def add_average_ratings(products):
+        for product in products:
+            if 'rating_sum' in product:
+                product['average_rating'] = Review.get_average_rating(product)
+                product.pop('rating_sum')
+        return products
+
+    def get_single_product(self, page, limit=2, cursor=None):
+        redis_key = self.generate_redis_key(self.productId, f"after-{cursor}" if cursor else page, limit)
+
+        try:
+            serialized_product, etag = product_cache.get_or_build(
+                redis_key, lambda: self.build_single_product(page, limit, cursor), self.PRODUCT_CACHE_TTL
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
 
-            sorted_reviews = sorted(reviews, key=lambda r: r.get('rating', 0), reverse=True)
+        if serialized_product:
+            return self.create_response(serialized_product, etag=etag)
+        return jsonify({'message': 'Product not found'}), 404
 
-            if sorted_reviews:
-                total_ratings = sum(Decimal(review.get('rating', 0)) for review in sorted_reviews)
-                average_rating = (total_ratings / Decimal(len(sorted_reviews))).quantize(Decimal('0.0'), rounding=ROUND_HALF_UP)
-            else:
-                average_rating = Decimal(0)
+    def build_single_product(self, page, limit, cursor):
+        product = db.products.find_one({'_id': self.productId}, {'reviews': 0, RESERVATIONS_FIELD: 0})
+        if not product:
+            return None, []
 
-            start_index = (page - 1) * limit
-            end_index = start_index + limit
-            paginated_reviews = sorted_reviews[start_index:end_index]
+        paginated_reviews, next_cursor = Review(product_id=self.productId).get_reviews(page, limit, cursor)
 
-            next_page_available = len(sorted_reviews) > end_index
+        serialized_product = ResponseEncoder.encode_for_cache({
+            **product,
+            'reviews': paginated_reviews,
+            'average_rating': Review.get_average_rating(product),
+            'next_page_available': next_cursor is not None,
+            'next_cursor': next_cursor
+        })
 
-            serialized_product = json.dumps({
-                **product,
-                'reviews': paginated_reviews,
-                'average_rating': float(average_rating),
-                'next_page_available': next_page_available
-            }, indent=2)
+        return serialized_product, [ProductCache.product_tag(self.productId)]
 
-            redis_client.setex(redis_key, 60, serialized_product)
-            return self.create_response(serialized_product)
-        return jsonify({'message': 'Product not found'}), 404
+    def get_product_category_list(self, page, limit, cursor=None, fields=None):
+        fields = fields or Product.parse_list_fields(None)
+        redis_key = self.generate_redis_key(self.category, f"after-{cursor}" if cursor else page, limit)
+        if fields != sorted(self.LIST_FIELDS):
+            redis_key = f"{redis_key}:{','.join(fields)}"
 
-    def get_product_category_list(self, page, limit):
-        redis_key = self.generate_redis_key(self.category, page, limit)
-        cached_products = self.get_cached_products(redis_key)
+        try:
+            cached_products, etag = product_cache.get_or_build(
+                redis_key, lambda: self.build_product_category_list(page, limit, cursor, fields), self.CATEGORY_CACHE_TTL
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
 
         if cached_products:
-            return self.create_response(cached_products)
-
-        products_list, next_page_available = self.query_products(page, limit)
-        if products_list:
-            for product in products_list:
-                reviews = product.get('reviews', [])
-                if reviews:
-                    total_ratings = sum(Decimal(review.get('rating', 0)) for review in reviews)
-                    average_rating = (total_ratings / Decimal(len(reviews))).quantize(Decimal('0.0'), rounding=ROUND_HALF_UP)
-                    product['average_rating'] = float(average_rating)
-                else:
-                    product['average_rating'] = 0.0
-
-            response_data = {
-                'data': products_list,
-                'next_page_available': next_page_available
-            }
-            redis_client.setex(redis_key, 300, json.dumps(response_data))
-            return self.create_response(response_data)
-
+            return self.create_response(cached_products, etag=etag)
         return jsonify({'message': 'No products found'}), 404
 
-    def get_cached_products(self, key):
-        cached_data = redis_client.get(key)
-        if cached_data:
-            return cached_data.decode('utf-8')
-        return None
+    def build_product_category_list(self, page, limit, cursor, fields):
+        products_list, next_cursor = self.query_products(page, limit, cursor, Product.list_projection(fields))
+        if not products_list:
+            return None, []
 
-    def query_products(self, page, limit):
-        skip = (page - 1) * limit
-        query = {'category': self.category} if self.category else {}
-        product_cursor = db.products.find(query).skip(skip).limit(limit + 1)
-        products_list = list(product_cursor)
+        Product.add_average_ratings(products_list)
 
-        next_page_available = len(products_list) > limit
-        if next_page_available:
-            products_list = products_list[:-1]
+        response_data = {
+            'data': products_list,
+            'next_page_available': next_cursor is not None,
+            'next_cursor': next_cursor
+        }
 
-        return products_list, next_page_available
+        tags = [ProductCache.category_tag(self.category)]
+        tags.extend(ProductCache.product_tag(product['_id']) for product in products_list)
+        return ResponseEncoder.encode_for_cache(response_data), tags
+
+    def query_products(self, page, limit, cursor=None, projection=None):
+        query = {'category': self.category} if self.category else {}
+        return self.pagination.fetch(db.products, query, limit, cursor=cursor, page=page, projection=projection)
 
     def generate_redis_key(self, key, page, limit):
-        return f"products:{key}:{page}:{limit}"
+        return f"products:{self.CACHE_VERSION}:{key}:{page}:{limit}"
 
-    def create_response(self, data, status=200):
-        if isinstance(data, dict):
-            data = json.dumps(data, indent=2)
-        return Response(data, mimetype='application/json', status=status)
+    def create_response(self, data, status=200, etag=None):
+        if isinstance(data, bytes):
+            return ResponseEncoder.cached_response(data, status, etag=etag, cache_control=self.CACHE_CONTROL)
+        return ResponseEncoder.json_response(data, status)
     
     def add_product_review(self, review_data):
-        product = None
-
-        if self.productId:
-            product = db.products.find_one({'_id': self.productId})  
-
-        if product:
-            db.products.update_one(
-               {'_id': review_data.get('productId')},
-               {'$push': {'reviews': review_data}},
-            )
+        try:
+            review_added = self.productId and Review(review_data=review_data, product_id=self.productId).add_review()
+        except (TypeError, ValueError):
+            return jsonify({'message': 'Invalid rating'}), 400
 
+        if review_added:
+            product_cache.invalidate(ProductCache.product_tag(self.productId))
             return jsonify({'success': 'Review added'}), 200
         else:
             return jsonify({'message': 'Something went wrong...'}), 400
         
-    def get_all_products(self, search_term, page, limit=10):
-        skip = limit * (page - 1)
+    def get_all_products(self, search_term, page, limit=10, cursor=None, fields=None):
+        """Admin listing and search, read from the primary so that an admin sees their own edits straight away."""
+        projection = Product.list_projection(Product.parse_list_fields(fields))
+        if search_term and search_term.strip():
+            return self.search_products(search_term.strip().lower(), page, limit, projection)
+
+        try:
+            products_list, next_cursor = self.pagination.fetch(
+                db.products, {}, limit, cursor=cursor, page=page, projection=projection
+            )
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
+
+        Product.add_average_ratings(products_list)
 
-        search_query = {}
+        total_count = count_cache.count(db.products, {})
 
-        if search_term:
-            regex_pattern = re.compile(f'.*{re.escape(search_term)}.*', re.IGNORECASE)
+        total_pages = math.ceil(total_count / limit)
 
-            try:
-                number_search = int(search_term)
-                price_query = {"price": number_search}
-                stock_query = {"stock": number_search}
-            except ValueError:
-                price_query = {}
-                stock_query = {}
+        return jsonify({'products': products_list, 'total_pages': total_pages, 'next_cursor': next_cursor}), 200
 
-            search_query = {
-                "$or": [
-                    {"title": regex_pattern},
-                    {"description": regex_pattern},
-                    {"brand": regex_pattern},
-                    {"category": regex_pattern},
-                    price_query,
-                    stock_query
-                ]
-            }
+    def search_products(self, search_term, page, limit=10, projection=None):
+        """Relevance-ranked search backed by the products text index, numeric terms also match price and stock."""
+        search_query = {'$text': {'$search': search_term}}
 
-            search_query["$or"] = [condition for condition in search_query["$or"] if condition]
+        try:
+            number_search = int(search_term)
+            search_query = {'$or': [search_query, {'price': number_search}, {'stock': number_search}]}
+        except ValueError:
+            pass
 
-        products = db.products.find(search_query).skip(skip).limit(limit)
+        skip = limit * (max(page, 1) - 1)
+        products = db.products.find(search_query, {**(projection or {}), 'score': {'$meta': 'textScore'}}) \
+            .sort([('score', {'$meta': 'textScore'}), ('_id', ASCENDING)]) \
+            .skip(skip).limit(limit)
 
-        products_list = list(products)
+        products_list = []
+        for product in products:
+            product.pop('score', None)
+            products_list.append(product)
+        Product.add_average_ratings(products_list)
 
-        total_count = db.products.count_documents(search_query)
+        total_count = count_cache.count(db.products, search_query)
 
         total_pages = math.ceil(total_count / limit)
 
-        return jsonify({'products': products_list, 'total_pages': total_pages}), 200
-    
+        return jsonify({'products': products_list, 'total_pages': total_pages, 'next_cursor': None}), 200
+
     def update_product(self):
         product = db.products.find_one({'_id': self.productId})
 
         if product:
-            db.products.update_one(
-                {'_id': self.productId},
-                {'$set': self.product}
-            )
+            changes = {field: self.product[field] for field in self.EDITABLE_FIELDS if field in self.product}
+            if changes:
+                db.products.update_one(
+                    {'_id': self.productId},
+                    {'$set': changes}
+                )
+
+            tags = [ProductCache.product_tag(self.productId)]
+            if changes.get('category', product.get('category')) != product.get('category'):
+                tags.append(ProductCache.category_tag(changes['category']))
+            product_cache.invalidate(*tags)
+            count_cache.invalidate('products')
 
             return jsonify({'success': 'Product updated'}), 200
         else:
@@ -190,6 +264,9 @@ class Product:
 
         if product:
             db.products.delete_one({'_id': self.productId})
+            Review.delete_product_reviews(self.productId)
+            product_cache.invalidate(ProductCache.product_tag(self.productId))
+            count_cache.invalidate('products')
 
             return jsonify({'success': 'Product deleted'}), 200
         else:
@@ -0,0 +1,106 @@
+"""
+This module stores product reviews in their own collection, indexed on
+(productId, rating), while the product document only keeps the
+review_count/rating_sum aggregates.
+
+Run `python -m app.product.reviews migrate` from the server directory to move
+reviews still embedded in product documents into the reviews collection.
+"""
+
+import sys
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+from .. import db, datetime, ReplaceOne, ASCENDING, DESCENDING
+from ..utils.KeysetPagination import KeysetPagination
+from ..db.indexes import IndexRegistry
+
+class Review:
+    pagination = KeysetPagination([('rating', DESCENDING), ('_id', ASCENDING)])
+
+    def __init__(self, review_data={}, product_id=None) -> None:
+        self.review_data = review_data
+        self.product_id = product_id
+
+    def add_review(self):
+        """Stores the review and updates the product aggregates, returns False if the product does not exist."""
+        rating = Review.parse_rating(self.review_data.get('rating', 0))
+
+        result = db.products.update_one(
+            {'_id': self.product_id},
+            {'$inc': {'review_count': 1, 'rating_sum': rating}}
+        )
+        if result.matched_count == 0:
+            return False
+
+        db.reviews.insert_one({
+            **self.review_data,
+            '_id': str(uuid.uuid4()),
+            'productId': self.product_id,
+            'rating': rating,
+            'created_timestamp': int(datetime.utcnow().timestamp())
+        })
+        return True
+
+    def get_reviews(self, page=1, limit=7, cursor=None):
+        return Review.pagination.fetch(
+            db.reviews, {'productId': self.product_id}, limit,
+            cursor=cursor, page=page, projection={'productId': 0}
+        )
+
+    def parse_rating(rating):
+        rating = float(rating)
+        return int(rating) if rating.is_integer() else rating
+
+    def get_average_rating(product):
+        review_count = product.get('review_count', 0)
+        if not review_count:
+            return 0.0
+        average_rating = Decimal(str(product.get('rating_sum', 0))) / Decimal(review_count)
+        return float(average_rating.quantize(Decimal('0.0'), rounding=ROUND_HALF_UP))
+
+    def delete_product_reviews(product_id):
+        db.reviews.delete_many({'productId': product_id})
+
+    def migrate_embedded_reviews():
+        """Moves embedded product reviews into the reviews collection and recomputes the aggregates."""
+        IndexRegistry.apply('reviews')
+        migrated_products = 0
+
+        for product in db.products.find({'reviews': {'$exists': True}}, {'reviews': 1}):
+            reviews = []
+            for index, review in enumerate(product.get('reviews', [])):
+                reviews.append({
+                    **review,
+                    '_id': review.get('_id', f"{product['_id']}:{index}"),
+                    'productId': product['_id'],
+                    'rating': Review.parse_rating(review.get('rating', 0))
+                })
+
+            if reviews:
+                db.reviews.bulk_write([ReplaceOne({'_id': review['_id']}, review, upsert=True) for review in reviews])
+
+            db.products.update_one(
+                {'_id': product['_id']},
+                {
+                    '$set': {
+                        'review_count': len(reviews),
+                        'rating_sum': sum(review['rating'] for review in reviews)
+                    },
+                    '$unset': {'reviews': ''}
+                }
+            )
+            migrated_products += 1
+
+        return migrated_products
+
+def main(argv):
+    if argv[1:] != ['migrate']:
+        print('Usage: python -m app.product.reviews migrate')
+        return 1
+
+    migrated_products = Review.migrate_embedded_reviews()
+    print(f"Migrated reviews of {migrated_products} products")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -4,11 +4,63 @@ from ..user.user import User
 from ..product.product import Product
 from ..order.order import Order
 from ..utils.ImageManager import ImageManager
+from ..utils.ImageVariants import ImageVariants
+from ..utils.ResponseEncoder import ResponseEncoder, FastJSONProvider
 from ..wishlist.wishlist import Wishlist
 from ..dashboard.dashboard import Dashboard
+from ..middleware import account_status_cache
+from ..db.metrics import pool_metrics, command_metrics
+from ..metrics.metrics import Metrics
 
 routes = Blueprint('routes', __name__)
 
+@routes.record_once
+def setup_response_encoding(state):
+    state.app.json = FastJSONProvider(state.app)
+
+# after_request hooks run in reverse order, so the recorded status is the one of the compressed response.
+# The latency is observed on teardown, which also runs when a view raises.
+routes.before_request(Metrics.start_timer)
+routes.after_request(Metrics.record_status)
+routes.after_request(ResponseEncoder.compress_response)
+routes.teardown_request(Metrics.record_request)
+
+image_variants = ImageVariants(
+    app.config['UPLOAD_FOLDER'],
+    max_bytes=int(os.environ.get('IMAGE_VARIANT_CACHE_BYTES', 512 * 1024 * 1024))
+)
+
+MAX_BATCH_PRODUCT_IDS = 100
+
+def get_product_ids_arg():
+    """Reads productIds, either repeated or comma separated, keeping the first occurrence of each id."""
+    product_ids = [
+        product_id.strip()
+        for value in request.args.getlist('productIds')
+        for product_id in value.split(',')
+        if product_id.strip()
+    ]
+    return list(dict.fromkeys(product_ids))
+
+def send_image(filepath, mimetype):
+    # conditional=True answers If-None-Match and Range requests, and the file is handed
+    # to the server's wsgi.file_wrapper so gunicorn can use sendfile().
+    return send_file(
+        filepath,
+        mimetype=mimetype,
+        etag=ImageManager.file_digest(filepath),
+        max_age=ImageManager.CACHE_CONTROL_MAX_AGE,
+        conditional=True
+    )
+
+@routes.route('/metrics', methods=['GET'])
+def metrics() -> Response:
+    if not Metrics.is_enabled():
+        return jsonify({'message': 'Not found'}), 404
+    if not Metrics.is_authorized():
+        return jsonify({'message': 'Unauthorized!'}), 401
+    return Metrics.render()
+
 @routes.route('/api/v1/validate_email', methods=['GET', 'POST'])
 def user_validate_email() -> Response:
     user_data = request.get_json()
@@ -118,13 +170,14 @@ def get_products() -> Response:
     category = request.args.get('category')
     productId = request.args.get('productId')
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', request.args.get('after', None))
     
     if productId:
         product = Product(productId=productId)
     else:
         product = Product(category=category)
 
-    response = product.get_product(page=page)
+    response = product.get_product(page=page, cursor=cursor, fields=request.args.get('fields', None))
 
     if response:
         return response
@@ -168,9 +221,10 @@ def user_get_order(user_data) -> Response:
     user_id = user_data.get('id', None)
     order_id = request.args.get('orderId', None)
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', request.args.get('after', None))
 
     order = Order(user_id=user_id)
-    response = order.get_orders(order_id=order_id, page=page)
+    response = order.get_orders(order_id=order_id, page=page, cursor=cursor, fields=request.args.get('fields', None))
 
     if response:
         return response
@@ -191,6 +245,18 @@ def user_has_purchased_product(user_data) -> Response:
     
     return jsonify({'message': 'Something went wrong...'}), 500
 
+@routes.route('/api/v1/user_orders_validation', methods=['GET'])
+@token_required
+def user_has_purchased_products(user_data) -> Response:
+    product_ids = get_product_ids_arg()
+    if not product_ids:
+        return jsonify({'message': 'productIds is required'}), 400
+    if len(product_ids) > MAX_BATCH_PRODUCT_IDS:
+        return jsonify({'message': f'At most {MAX_BATCH_PRODUCT_IDS} productIds are allowed'}), 400
+
+    order = Order(user_id=user_data.get('id', None))
+    return order.have_user_purchased_products(product_ids)
+
 @routes.route('/api/v1/cancel_order', methods=['PUT'])
 @token_required
 def user_cancel_order(_) -> Response:
@@ -211,6 +277,11 @@ def user_get_wish_list(user_data) -> Response:
     user_id = user_data.get('id', None)
 
     wishlist = Wishlist(user_id=user_id)
+    if request.args.get('hydrate', 'false').lower() == 'true':
+        page = request.args.get('page', 1, type=int)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        return wishlist.get_hydrated_wish_list(page, limit)
+
     response = wishlist.get_wish_list()
 
     if response:
@@ -249,6 +320,18 @@ def user_product_in_wish_list(user_data) -> Response:
     
     return jsonify({'message': 'Something went wrong...'}), 500
 
+@routes.route('/api/v1/products_in_wish_list', methods=['GET'])
+@token_required
+def user_products_in_wish_list(user_data) -> Response:
+    product_ids = get_product_ids_arg()
+    if not product_ids:
+        return jsonify({'message': 'productIds is required'}), 400
+    if len(product_ids) > MAX_BATCH_PRODUCT_IDS:
+        return jsonify({'message': f'At most {MAX_BATCH_PRODUCT_IDS} productIds are allowed'}), 400
+
+    wishlist = Wishlist(user_id=user_data.get('id', None))
+    return wishlist.products_in_wish_list(product_ids)
+
 @routes.route('/api/v1/remove_from_wishList', methods=['POST'])
 @token_required
 def user_remove_wishlist(_) -> Response:
@@ -267,6 +350,8 @@ def user_remove_wishlist(_) -> Response:
 @routes.route('/api/v1/upload', methods=['POST'])
 @admin_token_required
 def admin_upload_file(_) -> Response:
+    if request.content_length and request.content_length > ImageManager.MAX_FILE_SIZE + ImageManager.CHUNK_SIZE:
+        return jsonify({'message': 'File size exceeds 500 KB limit!'}), 413
     if 'file' not in request.files:
         return jsonify({'message': 'No file part'}), 400
     file = request.files['file']
@@ -275,20 +360,43 @@ def admin_upload_file(_) -> Response:
     
     image_manager = ImageManager(app.config['UPLOAD_FOLDER'])
 
-    success, message, file_path = image_manager.save_image(file, file.filename)
+    success, message, file_path, derivative_paths = image_manager.save_image(file, file.filename)
 
     if success:
-        return jsonify({'message': message, 'imageUrl': 'http://localhost:8000/api/v1/get_image?filepath=' + file_path}), 200
+        image_url = 'http://localhost:8000/api/v1/get_image?filepath='
+        return jsonify({
+            'message': message,
+            'imageUrl': image_url + file_path,
+            'derivatives': {name: image_url + path for name, path in derivative_paths.items()}
+        }), 200
     return jsonify({'message': message}), 400
 
 @routes.route('/api/v1/get_image', methods=['GET'])
 def admin_get_image():
     filepath = request.args.get('filepath')
+    width = request.args.get('w', type=int)
+    image_format = request.args.get('format')
 
-    if not os.path.isfile(filepath):
+    if not filepath or not os.path.isfile(filepath):
         return "File not found", 404
-    
-    return send_file(filepath, mimetype='image/*')
+
+    if not (width or image_format):
+        return send_image(filepath, 'image/*')
+
+    width, image_format = ImageVariants.normalize(width, image_format)
+    if not image_format:
+        return jsonify({'message': 'Unsupported image format'}), 400
+
+    # A variant can still be evicted by another request between the lookup and send_file, it is then generated again
+    for _ in range(2):
+        variant_path, mimetype = image_variants.get_variant(filepath, width, image_format)
+        if not variant_path:
+            return "File not found", 404
+        try:
+            return send_image(variant_path, mimetype)
+        except FileNotFoundError:
+            continue
+    return jsonify({'message': 'Something went wrong...'}), 500
 
 @routes.route('/api/v1/admin/get_dashboard_data', methods=['GET'])
 @admin_token_required
@@ -305,13 +413,35 @@ def admin_get_dashboard_data(user_data) -> Response:
     
     return jsonify({'message': 'Something went wrong...'}), 500
 
+@routes.route('/api/v1/admin/get_sales', methods=['GET'])
+@admin_token_required
+def admin_get_sales(user_data) -> Response:
+    dashboard = Dashboard(user_id=user_data.get('id', None), user_is_admin=user_data.get('is_admin', None))
+
+    return dashboard.get_sales(
+        start=request.args.get('from', None),
+        end=request.args.get('to', None),
+        granularity=request.args.get('granularity', 'month')
+    )
+
+@routes.route('/api/v1/admin/account_cache_stats', methods=['GET'])
+@admin_token_required
+def admin_get_account_cache_stats(_) -> Response:
+    return jsonify(account_status_cache.stats()), 200
+
+@routes.route('/api/v1/admin/db_pool_stats', methods=['GET'])
+@admin_token_required
+def admin_get_db_pool_stats(_) -> Response:
+    return jsonify({'pool': pool_metrics.stats(), 'commands': command_metrics.stats()}), 200
+
 @routes.route('/api/v1/admin/get_all_users', methods=['GET'])
 @admin_token_required
 def admin_get_all_users(_) -> Response:
     search_term = request.args.get('searchTerm', None)
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', request.args.get('after', None))
     user = User()
-    response = user.get_all_users(search_term=search_term, page=page)
+    response = user.get_all_users(search_term=search_term, page=page, cursor=cursor)
 
     if response:
         return response
@@ -355,8 +485,9 @@ def admin_add_product(user_data) -> Response:
 def admin_get_all_products(_) -> Response:
     search_term = request.args.get('searchTerm', None)
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor', request.args.get('after', None))
     product = Product()
-    response = product.get_all_products(search_term=search_term, page=page)
+    response = product.get_all_products(search_term=search_term, page=page, cursor=cursor, fields=request.args.get('fields', None))
 
     if response:
         return response
@@ -397,11 +528,15 @@ def admin_delete_product(_) -> Response:
 def admin_get_orders(_) -> Response:
     search_term = request.args.get('searchTerm', None)
     page = request.args.get('page', 1, type=int)
-    order = Order()
-    response = order.get_orders(search_term=search_term, page=page)
+    cursor = request.args.get('cursor', request.args.get('after', None))
 
-    if response:
-        return response
+    try:
+        orders = Order.get_all_orders(search_term=search_term, page=page, cursor=cursor, fields=request.args.get('fields', None))
+    except ValueError:
+        return jsonify({'message': 'Invalid cursor'}), 400
+
+    if orders:
+        return jsonify(orders), 200
     
     return jsonify({'message': 'Something went wrong...'}), 500
 
@@ -0,0 +1,11 @@
+import os
+from .. import redis_client
+from ..utils.TwoTierCache import TwoTierCache
+
+user_cache = TwoTierCache(
+    redis_client,
+    'user',
+    local_ttl=int(os.environ.get('USER_CACHE_LOCAL_TTL', 5)),
+    redis_ttl=int(os.environ.get('USER_CACHE_REDIS_TTL', 3600)),
+    max_size=int(os.environ.get('USER_CACHE_MAX_SIZE', 10000))
+)
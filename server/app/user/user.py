@@ -1,15 +1,25 @@
-from .. import Response, bcrypt, json, jsonify, db, redis_client, datetime
+from .. import Response, jsonify, db, count_cache, datetime, ASCENDING
+from ..auth import password_hasher
+from ..auth.hasher import PasswordHasherBusy
+from ..auth.auth import Auth
+from ..middleware import account_status_cache
+from . import user_cache
+from ..dashboard.stats import DashboardStats
+from ..utils.KeysetPagination import KeysetPagination
+from ..utils.ResponseEncoder import ResponseEncoder
 import re
 import math
 
 class User:
+    # Sign-up order, _id is a uuid4 and only breaks ties
+    pagination = KeysetPagination([('account_created_timestamp', ASCENDING), ('_id', ASCENDING)])
+
     def __init__(self, _id=None, email=None) -> None:
         self._id = _id
         self.email = email
     
     def get_user(self) -> Response:
-        cache_key = f"user:{self.email}"
-        cached_user = redis_client.get(cache_key)
+        cached_user = user_cache.get(self.email)
         if cached_user:
             return Response(cached_user, mimetype='application/json', status=200)
 
@@ -27,9 +37,9 @@ class User:
                 "expires": user_exists.get("expires", None)
             }
 
-            response_json = json.dumps(user_data, indent=2)
+            response_json = ResponseEncoder.dumps(user_data)
 
-            redis_client.setex(cache_key, 3600, response_json)
+            user_cache.set(self.email, response_json)
             
             return Response(response_json, mimetype='application/json', status=200)
         return jsonify({'message': 'User does not exist!'}), 401
@@ -37,25 +47,30 @@ class User:
     def delete_user(self):
         db.wishlist.delete_many({'userId': self._id})
 
-        result = db.users.delete_one({'email': self.email})
+        deleted_user = db.users.find_one_and_delete({'email': self.email}, projection={'user_account_is_active': 1})
+        account_status_cache.invalidate(self.email)
+        user_cache.invalidate(self.email)
+        count_cache.invalidate('users')
 
-        if result.deleted_count == 0:
+        if not deleted_user:
             return jsonify({'message': 'User does not exist!'}), 404
 
+        DashboardStats.record_user_status_change(deleted_user.get('user_account_is_active', True), False)
+
         return jsonify({'message': 'User and wishlist deleted successfully!'}), 200
 
-    def get_all_users(self, search_term=None, page=1, page_size=10):
+    def get_all_users(self, search_term=None, page=1, page_size=10, cursor=None):
         query = {}
-        if search_term:
-            regex = re.compile(f'.*{re.escape(search_term)}.*', re.IGNORECASE)
+        if search_term and search_term.strip():
+            regex = re.compile(f'.*{re.escape(search_term.strip().lower())}.*', re.IGNORECASE)
             query['email'] = regex
 
-        skip = (page - 1) * page_size
+        try:
+            users, next_cursor = self.pagination.fetch(db.users, query, page_size, cursor=cursor, page=page)
+        except ValueError:
+            return jsonify({'message': 'Invalid cursor'}), 400
 
-        total_count = db.users.count_documents(query)
-
-        cursor = db.users.find(query).skip(skip).limit(page_size)
-        users = [user for user in cursor]
+        total_count = count_cache.count(db.users, query)
 
         serialized_users = []
 
@@ -71,7 +86,7 @@ class User:
 
         total_pages = math.ceil(total_count / page_size)
 
-        return jsonify({"users": serialized_users, "total_pages": total_pages}), 200
+        return jsonify({"users": serialized_users, "total_pages": total_pages, "next_cursor": next_cursor}), 200
     
     def update_user(self, user_details):
         admin_fields = ['user_is_admin', 'user_account_is_active']
@@ -80,10 +95,10 @@ class User:
         update_fields = {k: user_details[k] for k in admin_fields + user_fields if k in user_details}
 
         if 'password' in user_details and user_details['password'].strip():
-            update_fields['password'] = bcrypt.hashpw(
-                user_details['password'].encode('utf-8'), 
-                bcrypt.gensalt()
-            )
+            try:
+                update_fields['password'] = password_hasher.hash(user_details['password'])
+            except PasswordHasherBusy:
+                return Auth.busy_response()
 
         if not update_fields:
             return jsonify({'message': 'No valid fields provided'}), 400
@@ -93,14 +108,26 @@ class User:
             if existing_user and existing_user['_id'] != self._id:
                 return jsonify({'message': 'Email already in use by another account'}), 409
             
-        result = db.users.update_one(
+        previous_user = db.users.find_one_and_update(
             {'email': self.email},
-            {'$set': update_fields}
+            {'$set': update_fields},
+            projection={'user_account_is_active': 1}
         )
 
-        if result.matched_count == 0:
+        account_status_cache.invalidate(self.email, update_fields.get('email'))
+        user_cache.invalidate(self.email, update_fields.get('email'))
+        if 'email' in update_fields:
+            count_cache.invalidate('users')
+
+        if not previous_user:
             return jsonify({'message': 'User does not exist!'}), 404
 
+        if 'user_account_is_active' in update_fields:
+            DashboardStats.record_user_status_change(
+                previous_user.get('user_account_is_active', True),
+                update_fields['user_account_is_active']
+            )
+
         return jsonify({'message': 'User updated successfully!'}), 200
     
     def user_is_admin(userId):
@@ -0,0 +1,58 @@
+import hashlib
+from bson import json_util
+from .TwoTierCache import TwoTierCache
+
+class CountCache:
+    """
+    Caches count_documents results per (collection, normalized query) for the admin
+    listings' total_pages. Unfiltered counts come from the collection metadata through
+    estimated_document_count and are not cached. Write paths invalidate a collection,
+    which drops every cached count registered under it, on all workers.
+    """
+
+    KEYS_PREFIX = 'count_keys'
+
+    def __init__(self, redis_client, ttl=60, local_ttl=5, max_size=1000) -> None:
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.cache = TwoTierCache(redis_client, 'counts', local_ttl=local_ttl, redis_ttl=ttl, max_size=max_size)
+
+    @staticmethod
+    def query_key(collection_name, query):
+        normalized = json_util.dumps(query, sort_keys=True, separators=(',', ':'))
+        return f"{collection_name}:{hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def count(self, collection, query):
+        if not query:
+            return collection.estimated_document_count()
+
+        key = self.query_key(collection.name, query)
+        cached_count = self.cache.get(key)
+        if cached_count is not None:
+            return int(cached_count)
+
+        count = collection.count_documents(query)
+        self.cache.set(key, str(count))
+        try:
+            keys_key = f"{self.KEYS_PREFIX}:{collection.name}"
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.sadd(keys_key, key)
+                pipe.expire(keys_key, self.ttl)
+                pipe.execute()
+        except Exception as e:
+            print(f"Redis error registering cached count: {e}")
+        return count
+
+    def invalidate(self, *collection_names):
+        for collection_name in collection_names:
+            keys_key = f"{self.KEYS_PREFIX}:{collection_name}"
+            try:
+                with self.redis_client.pipeline() as pipe:
+                    pipe.smembers(keys_key)
+                    pipe.delete(keys_key)
+                    keys, _ = pipe.execute()
+            except Exception as e:
+                print(f"Redis error invalidating cached counts: {e}")
+                continue
+
+            self.cache.invalidate(*[key.decode('utf-8') for key in keys])
@@ -1,12 +1,50 @@
 import os
-import uuid
+import hashlib
+import tempfile
+from threading import Lock
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
-import io
 from werkzeug.utils import secure_filename
+from .LRUCache import LRUCache
+
+def generate_derivatives(source_path, derivatives):
+    """
+    Runs in the image process pool: renders every (path, max_width, format)
+    derivative of source_path that does not exist yet.
+    """
+    with Image.open(source_path) as img:
+        img.load()
+        for path, max_width, image_format in derivatives:
+            if os.path.exists(path):
+                continue
+
+            derivative = img.copy()
+            if max_width and derivative.width > max_width:
+                derivative.thumbnail((max_width, derivative.height))
+            if derivative.mode not in ('RGB', 'RGBA'):
+                derivative = derivative.convert('RGBA' if 'transparency' in derivative.info else 'RGB')
+
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            os.close(fd)
+            try:
+                derivative.save(temp_path, format=image_format, quality=80)
+                os.replace(temp_path, path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
 
 class ImageManager:
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
     MAX_FILE_SIZE = 500 * 1024
+    CHUNK_SIZE = 64 * 1024
+    CACHE_CONTROL_MAX_AGE = 86400
+    DERIVATIVES = {
+        'thumbnail': (320, 'WEBP', '_thumb.webp'),
+        'webp': (None, 'WEBP', '.webp')
+    }
+    digests = LRUCache(max_size=10000, ttl=3600)
+    derivative_pool = None
+    derivative_pool_lock = Lock()
 
     def __init__(self, upload_folder):
         self.upload_folder = upload_folder
@@ -16,42 +54,113 @@ class ImageManager:
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in ImageManager.ALLOWED_EXTENSIONS
 
     @staticmethod
-    def is_valid_image(file_stream):
-        file_stream_copy = io.BytesIO(file_stream.read())
-        file_stream.seek(0)
-
-        file_stream_copy.seek(0, os.SEEK_END)
-        file_size = file_stream_copy.tell()
-        file_stream_copy.seek(0)
-
-        if file_size > ImageManager.MAX_FILE_SIZE:
-            return False, 'File size exceeds 500 KB limit!'
-
+    def is_valid_image(file_path):
         try:
-            with Image.open(file_stream_copy) as img:
+            with Image.open(file_path) as img:
                 img.verify()
                 return True, 'Valid image!'
         except (IOError, SyntaxError):
             return False, 'Invalid image file!'
 
+    def stream_to_disk(self, file_stream):
+        """
+        Copies the upload to a temporary file in chunks, hashing it on the way and
+        stopping as soon as it exceeds MAX_FILE_SIZE. Returns (temp_path, digest), or
+        (None, None) when the file is too large.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        size = 0
+
+        fd, temp_path = tempfile.mkstemp(dir=self.upload_folder, suffix='.upload')
+        with os.fdopen(fd, 'wb') as temp_file:
+            for chunk in iter(lambda: file_stream.read(self.CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > self.MAX_FILE_SIZE:
+                    break
+                hasher.update(chunk)
+                temp_file.write(chunk)
+
+        if size > self.MAX_FILE_SIZE:
+            os.remove(temp_path)
+            return None, None
+        return temp_path, hasher.hexdigest()
+
     def save_image(self, file, filename):
-        if file and self.allowed_file(filename):
-            valid, message = self.is_valid_image(file.stream)
+        """
+        Stores the upload under its content hash, so re-uploading the same image is
+        deduplicated, and schedules its derivatives in the background. Returns
+        (success, message, file_path, derivative_paths).
+        """
+        if not file or not self.allowed_file(filename):
+            return False, 'Invalid file extension!', None, {}
+
+        name, ext = os.path.splitext(secure_filename(filename))
+        if not ext or not name:
+            return False, 'Invalid file name!', None, {}
+
+        temp_path, digest = self.stream_to_disk(file.stream)
+        if not temp_path:
+            return False, 'File size exceeds 500 KB limit!', None, {}
+
+        try:
+            valid, message = self.is_valid_image(temp_path)
             if not valid:
-                return False, message, None
+                return False, message, None, {}
+
+            file_path = os.path.join(self.upload_folder, f"{digest}{ext.lower()}")
+            if os.path.exists(file_path):
+                message = 'File already uploaded!'
+            else:
+                os.replace(temp_path, file_path)
+                message = 'File uploaded successfully!'
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        derivative_paths = self.schedule_derivatives(file_path, digest)
+        return True, message, file_path, derivative_paths
 
-            filename = secure_filename(filename)
+    def schedule_derivatives(self, file_path, digest):
+        derivative_paths = {}
+        pending = []
+        for name, (max_width, image_format, suffix) in self.DERIVATIVES.items():
+            path = os.path.join(self.upload_folder, f"{digest}{suffix}")
+            derivative_paths[name] = path
+            if not os.path.exists(path):
+                pending.append((path, max_width, image_format))
 
-            unique_id = str(uuid.uuid4())
+        if pending:
+            self.get_derivative_pool().submit(generate_derivatives, file_path, pending) \
+                .add_done_callback(ImageManager.log_derivative_errors)
+        return derivative_paths
 
-            name, ext = os.path.splitext(filename)
+    @staticmethod
+    def get_derivative_pool():
+        with ImageManager.derivative_pool_lock:
+            if ImageManager.derivative_pool is None:
+                ImageManager.derivative_pool = ProcessPoolExecutor(
+                    max_workers=int(os.environ.get('IMAGE_WORKERS', 2))
+                )
+            return ImageManager.derivative_pool
+
+    @staticmethod
+    def log_derivative_errors(future):
+        error = future.exception()
+        if error:
+            print(f"Could not generate image derivatives: {error}")
+
+    @staticmethod
+    def file_digest(file_path):
+        """Content hash of the file, cached per (path, mtime, size) so it is only computed once per version."""
+        stat = os.stat(file_path)
+        cache_key = (file_path, stat.st_mtime_ns, stat.st_size)
 
-            if not ext or not name:
-                return False, 'Invalid file name!', None
-            
-            unique_filename = f"{name}_{unique_id}{ext}"
-            filename = secure_filename(unique_filename)
-            file_path = os.path.join(self.upload_folder, unique_filename)
-            file.save(file_path)
-            return True, 'File uploaded successfully!', file_path
-        return False, 'Invalid file extension!', None
+        digest = ImageManager.digests.get(cache_key)
+        if digest is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(ImageManager.CHUNK_SIZE), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            ImageManager.digests.set(cache_key, digest)
+        return digest
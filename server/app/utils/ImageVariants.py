@@ -0,0 +1,127 @@
+import os
+import time
+from threading import Lock
+from collections import OrderedDict
+from .ImageManager import ImageManager, generate_derivatives
+
+class ImageVariants:
+    """
+    Resized/re-encoded variants of uploaded images, generated lazily with Pillow
+    and kept in a size-bounded LRU cache on disk. Variants used within the last
+    EVICTION_GRACE seconds are never evicted, so a file is not removed while a
+    request that just looked it up is still opening or hashing it.
+    """
+
+    EVICTION_GRACE = 30
+
+    WIDTHS = (64, 160, 320, 640, 1024)
+    FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg'), 'png': ('PNG', 'image/png')}
+    DEFAULT_FORMAT = 'webp'
+
+    def __init__(self, source_folder, max_bytes=512 * 1024 * 1024) -> None:
+        self.source_folder = os.path.realpath(source_folder)
+        self.variant_folder = os.path.join(self.source_folder, 'variants')
+        self.max_bytes = max_bytes
+        self._entries = None
+        self._total_bytes = 0
+        self._lock = Lock()
+        self._generation_locks = {}
+
+    @staticmethod
+    def normalize(width, image_format):
+        """Snaps width up to the nearest allowed size, returns None for unsupported formats."""
+        image_format = (image_format or ImageVariants.DEFAULT_FORMAT).lower()
+        if image_format == 'jpg':
+            image_format = 'jpeg'
+        if image_format not in ImageVariants.FORMATS:
+            return None, None
+
+        if width:
+            width = next((allowed for allowed in ImageVariants.WIDTHS if allowed >= width), ImageVariants.WIDTHS[-1])
+        return width, image_format
+
+    def get_variant(self, source_path, width, image_format):
+        """Returns (path, mimetype) of the variant, generating it on first use, or (None, None)."""
+        source_path = os.path.realpath(source_path)
+        if os.path.dirname(source_path) != self.source_folder or not os.path.isfile(source_path):
+            return None, None
+
+        pil_format, mimetype = self.FORMATS[image_format]
+        digest = ImageManager.file_digest(source_path)
+        path = os.path.join(self.variant_folder, f"{digest}_{width or 'full'}.{image_format}")
+
+        self._load_entries()
+        if self._touch(path):
+            return path, mimetype
+
+        with self._generation_lock(path):
+            if not os.path.exists(path):
+                os.makedirs(self.variant_folder, exist_ok=True)
+                # Pillow runs in the image process pool, waiting on the future yields to the other greenlets
+                ImageManager.get_derivative_pool().submit(
+                    generate_derivatives, source_path, [(path, width, pil_format)]
+                ).result()
+            self._add(path)
+
+        return path, mimetype
+
+    def _generation_lock(self, path):
+        with self._lock:
+            return self._generation_locks.setdefault(path, Lock())
+
+    def _load_entries(self):
+        """Builds the LRU index from the variant folder, oldest first, on first use."""
+        if self._entries is not None:
+            return
+
+        with self._lock:
+            if self._entries is not None:
+                return
+
+            entries = []
+            if os.path.isdir(self.variant_folder):
+                for entry in os.scandir(self.variant_folder):
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.path, stat.st_size))
+
+            self._entries = OrderedDict((path, (size, mtime)) for mtime, path, size in sorted(entries))
+            self._total_bytes = sum(size for size, _ in self._entries.values())
+
+    def _touch(self, path):
+        with self._lock:
+            if path not in self._entries:
+                return False
+            self._entries[path] = (self._entries[path][0], time.time())
+            self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(path, (0, None))[0]
+            return False
+        return True
+
+    def _add(self, path):
+        size = os.path.getsize(path)
+        evicted = []
+        now = time.time()
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(path, (0, None))[0]
+            self._entries[path] = (size, now)
+            self._generation_locks.pop(path, None)
+
+            # Entries are in least recently used order, once the oldest is within the grace window all the others are too
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                evicted_path, (evicted_size, touched) = next(iter(self._entries.items()))
+                if now - touched < self.EVICTION_GRACE:
+                    break
+                del self._entries[evicted_path]
+                self._total_bytes -= evicted_size
+                evicted.append(evicted_path)
+
+        for evicted_path in evicted:
+            try:
+                os.remove(evicted_path)
+            except FileNotFoundError:
+                pass
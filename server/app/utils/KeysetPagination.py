@@ -0,0 +1,61 @@
+import base64
+import binascii
+from bson import json_util
+
+class KeysetPagination:
+    """
+    Index-ordered (keyset) pagination. The cursor handed to clients is an opaque,
+    url-safe encoding of the sort key of the last document on the page, and the next
+    page is fetched with a range query on those fields instead of skip().
+    """
+
+    def __init__(self, sort_fields):
+        self.sort_fields = sort_fields
+
+    def encode_cursor(self, document):
+        values = [document.get(field) for field, _ in self.sort_fields]
+        return base64.urlsafe_b64encode(json_util.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            values = json_util.loads(base64.urlsafe_b64decode(cursor + padding))
+        except (ValueError, TypeError, binascii.Error):
+            raise ValueError('Invalid cursor')
+
+        if not isinstance(values, list) or len(values) != len(self.sort_fields):
+            raise ValueError('Invalid cursor')
+        return values
+
+    def after(self, query, values):
+        """Extends query so that it only matches documents sorted after values."""
+        conditions = []
+        for index, (field, direction) in enumerate(self.sort_fields):
+            condition = {prev_field: values[i] for i, (prev_field, _) in enumerate(self.sort_fields[:index])}
+            condition[field] = {'$gt' if direction > 0 else '$lt': values[index]}
+            conditions.append(condition)
+
+        range_query = conditions[0] if len(conditions) == 1 else {'$or': conditions}
+        if not query:
+            return range_query
+        return {'$and': [query, range_query]}
+
+    def fetch(self, collection, query, limit, cursor=None, page=1, projection=None):
+        """
+        Returns (documents, next_cursor). A cursor takes precedence over page,
+        which is only kept as the legacy skip() based path.
+        """
+        if cursor:
+            query = self.after(query, self.decode_cursor(cursor))
+            skip = 0
+        else:
+            skip = (max(page, 1) - 1) * limit
+
+        documents = list(collection.find(query, projection).sort(self.sort_fields).skip(skip).limit(limit + 1))
+
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = self.encode_cursor(documents[-1])
+
+        return documents, next_cursor
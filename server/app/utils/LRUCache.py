@@ -0,0 +1,59 @@
+import time
+from threading import Lock
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded, process-local LRU cache whose entries expire after ttl seconds.
+    """
+
+    MISSING = object()
+
+    def __init__(self, max_size=1000, ttl=60) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def get_many(self, keys):
+        """Returns a dict with the keys that are cached, the others are left out."""
+        found = {}
+        for key in keys:
+            value = self.get(key, self.MISSING)
+            if value is not self.MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,31 @@
+import re
+
+class Projection:
+    """
+    Builds Mongo inclusion projections from a client supplied, comma separated
+    `fields` parameter, falling back to the lean default of the listing.
+    """
+
+    FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+    @staticmethod
+    def parse_fields(fields, default, excluded=()):
+        """Returns the sorted, validated field paths, the excluded top-level fields are never projected."""
+        if fields:
+            requested = [field.strip() for field in fields.split(',')]
+            requested = [field for field in requested if Projection.FIELD_PATTERN.match(field)]
+        else:
+            requested = list(default)
+
+        requested = {field for field in requested if field.split('.')[0] not in excluded}
+        # A path and one of its ancestors cannot both be projected, the ancestor wins
+        return sorted(
+            field for field in requested
+            if not any(field.startswith(f"{other}.") for other in requested)
+        ) or sorted(default)
+
+    @staticmethod
+    def build(fields, required=()):
+        projection = {field: 1 for field in fields}
+        projection.update({field: 1 for field in required if field != '_id'})
+        return projection
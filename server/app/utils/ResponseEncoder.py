@@ -0,0 +1,147 @@
+"""
+This module is the response-encoding layer shared by the routes blueprint:
+compact JSON (through orjson when it is installed), gzip/brotli negotiated from
+Accept-Encoding, and helpers to serve payloads that are cached already gzipped.
+"""
+
+import gzip
+import json
+from datetime import datetime, timezone
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class ResponseEncoder:
+    MIN_COMPRESS_SIZE = 512
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/css', 'application/javascript')
+
+    @staticmethod
+    def default(obj):
+        """Datetimes, stored as naive UTC by pymongo, are sent as ISO 8601 with a Z suffix like orjson does."""
+        if isinstance(obj, datetime):
+            if obj.tzinfo:
+                obj = obj.astimezone(timezone.utc).replace(tzinfo=None)
+            return f"{obj.isoformat()}Z"
+        return DefaultJSONProvider.default(obj)
+
+    @staticmethod
+    def dumps(data):
+        """Serializes data to compact JSON bytes."""
+        if orjson:
+            return orjson.dumps(data, default=DefaultJSONProvider.default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z)
+        return json.dumps(data, separators=(',', ':'), default=ResponseEncoder.default).encode('utf-8')
+
+    @staticmethod
+    def encode_for_cache(data):
+        """Serializes and gzips data, so that a cache hit can be sent without re-encoding."""
+        return gzip.compress(ResponseEncoder.dumps(data), compresslevel=ResponseEncoder.GZIP_LEVEL, mtime=0)
+
+    @staticmethod
+    def accepted_encodings():
+        accepted = {}
+        for part in request.headers.get('Accept-Encoding', '').split(','):
+            coding, _, params = part.strip().partition(';')
+            if not coding:
+                continue
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    quality = float(params[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        return {coding for coding, quality in accepted.items() if quality > 0}
+
+    @staticmethod
+    def negotiate():
+        accepted = ResponseEncoder.accepted_encodings()
+        if brotli and ('br' in accepted or '*' in accepted):
+            return 'br'
+        if 'gzip' in accepted or '*' in accepted:
+            return 'gzip'
+        return None
+
+    @staticmethod
+    def compress(body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=ResponseEncoder.BROTLI_QUALITY)
+        return gzip.compress(body, compresslevel=ResponseEncoder.GZIP_LEVEL, mtime=0)
+
+    @staticmethod
+    def json_response(data, status=200):
+        return Response(ResponseEncoder.dumps(data), mimetype='application/json', status=status)
+
+    @staticmethod
+    def cached_response(payload, status=200, etag=None, cache_control=None):
+        """
+        Builds a response from a payload produced by encode_for_cache. With an etag,
+        a matching If-None-Match is answered with 304 without sending the payload.
+        """
+        accepted = ResponseEncoder.accepted_encodings()
+        send_gzip = 'gzip' in accepted or '*' in accepted
+
+        if etag and not send_gzip:
+            etag = f"{etag}-identity"
+
+        if etag and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        elif send_gzip:
+            response = Response(payload, mimetype='application/json', status=status)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(payload), mimetype='application/json', status=status)
+
+        if etag:
+            response.set_etag(etag)
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @staticmethod
+    def compress_response(response):
+        """after_request hook compressing any sufficiently large text response the client accepts."""
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in ResponseEncoder.COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        body = response.get_data()
+        if len(body) < ResponseEncoder.MIN_COMPRESS_SIZE:
+            return response
+
+        encoding = ResponseEncoder.negotiate()
+        if encoding:
+            response.set_data(ResponseEncoder.compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider so that jsonify() goes through ResponseEncoder as well."""
+
+    compact = True
+    default = staticmethod(ResponseEncoder.default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson and not kwargs:
+            return ResponseEncoder.dumps(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(ResponseEncoder.dumps(obj), mimetype=self.mimetype)
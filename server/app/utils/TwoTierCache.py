@@ -0,0 +1,149 @@
+import json
+import time
+from threading import Lock
+from .LRUCache import LRUCache
+from ..metrics.metrics import Metrics
+
+class TwoTierCache:
+    """
+    Bounded in-process LRU (L1) with a short TTL in front of Redis (L2). Invalidations are
+    published over Redis pub/sub so every worker drops its L1 copy; should a worker miss a
+    message while its listener reconnects, its copy still expires after local_ttl.
+    """
+
+    CHANNEL = 'cache_invalidation'
+    RECONNECT_DELAY = 1
+    instances = {}
+
+    def __init__(self, redis_client, namespace, local_ttl=5, redis_ttl=300, max_size=1000) -> None:
+        self.redis_client = redis_client
+        self.namespace = namespace
+        self.redis_ttl = redis_ttl
+        self.local = LRUCache(max_size=max_size, ttl=local_ttl)
+        self._lock = Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        TwoTierCache.instances[namespace] = self
+
+    def redis_key(self, key):
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """Returns a dict with the keys that are cached, L1 misses are fetched with a single MGET."""
+        found = self.local.get_many(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+
+        redis_found = {}
+        if missing:
+            try:
+                values = self.redis_client.mget([self.redis_key(key) for key in missing])
+            except Exception as e:
+                print(f"Redis error reading cache: {e}")
+                values = [None] * len(missing)
+
+            for key, value in zip(missing, values):
+                if value is not None:
+                    self.local.set(key, value)
+                    redis_found[key] = value
+
+        with self._lock:
+            self.local_hits += len(found)
+            self.redis_hits += len(redis_found)
+            self.misses += len(missing) - len(redis_found)
+        Metrics.record_cache(self.namespace, len(found), len(redis_found), len(missing) - len(redis_found))
+
+        found.update(redis_found)
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values, ttl=None):
+        for key, value in values.items():
+            self.local.set(key, value)
+        try:
+            with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.setex(self.redis_key(key), ttl or self.redis_ttl, value)
+                pipe.execute()
+        except Exception as e:
+            print(f"Redis error writing cache: {e}")
+
+    def get_local(self, key):
+        """L1 only lookup, for callers that manage the Redis side themselves."""
+        value = self.local.get(key)
+        if value is not None:
+            with self._lock:
+                self.local_hits += 1
+            Metrics.record_cache(self.namespace, local_hits=1)
+        return value
+
+    def set_local(self, key, value):
+        self.local.set(key, value)
+
+    def invalidate(self, *keys):
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+
+        try:
+            self.redis_client.delete(*[self.redis_key(key) for key in keys])
+        except Exception as e:
+            print(f"Redis error invalidating cache: {e}")
+        self.invalidate_local(*keys)
+
+    def invalidate_local(self, *keys):
+        """Drops keys from the L1 of this worker and, through pub/sub, of every other worker."""
+        keys = [key for key in keys if key]
+        if not keys:
+            return
+
+        self.local.delete(*keys)
+        try:
+            self.redis_client.publish(self.CHANNEL, json.dumps({'namespace': self.namespace, 'keys': keys}))
+        except Exception as e:
+            print(f"Redis error publishing cache invalidation: {e}")
+
+    def stats(self):
+        with self._lock:
+            hits = self.local_hits + self.redis_hits
+            total = hits + self.misses
+            return {
+                'local_hits': self.local_hits,
+                'redis_hits': self.redis_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / total, 4) if total else 0.0,
+                'local_entries': len(self.local)
+            }
+
+    @staticmethod
+    def handle_invalidation(message):
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+
+        cache = TwoTierCache.instances.get(data.get('namespace'))
+        if cache:
+            cache.local.delete(*data.get('keys', []))
+
+    @staticmethod
+    def listen(redis_client):
+        """Blocking loop applying the invalidations published by other workers, meant to run in its own thread."""
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(TwoTierCache.CHANNEL)
+                for cache in TwoTierCache.instances.values():
+                    cache.local.clear()
+                for message in pubsub.listen():
+                    TwoTierCache.handle_invalidation(message)
+            except Exception as e:
+                print(f"Redis error listening for cache invalidations: {e}")
+            finally:
+                pubsub.close()
+            time.sleep(TwoTierCache.RECONNECT_DELAY)
@@ -1,6 +1,10 @@
+import math
 from .. import db, jsonify
+from ..product.reviews import Review
 
 class Wishlist:
+    PRODUCT_FIELDS = ('title', 'category', 'price', 'discount_percentage', 'thumbnail', 'stock', 'review_count', 'rating_sum')
+
     def __init__(self, _id=None, user_id=None, product_id=None) -> None:
         self._id = _id
         self.user_id = user_id
@@ -20,15 +24,18 @@ class Wishlist:
         return jsonify({'message': 'Product added to wishlist'}), 200
     
     def product_in_wish_list(self):
-        wishlist = db.wishlist.find_one({'userId': self.user_id})
+        wishlist = db.wishlist.find_one({'userId': self.user_id, 'products': self.product_id}, {'_id': 1})
+        return jsonify({'message': wishlist is not None }), 200
 
-        if wishlist:
-            products = wishlist.get('products', [])
+    def products_in_wish_list(self, product_ids):
+        """Returns {productId: bool} for product_ids, only the matching ids are read back from the wishlist."""
+        wishlist = db.wishlist.find_one(
+            {'userId': self.user_id},
+            {'_id': 0, 'products': {'$filter': {'input': '$products', 'cond': {'$in': ['$$this', product_ids]}}}}
+        )
 
-            for product in products:
-                if product == self.product_id:
-                    return jsonify({'message': True }), 200
-        return jsonify({'message': False }), 200
+        wishlisted = set(wishlist.get('products') or []) if wishlist else set()
+        return jsonify({'products': {product_id: product_id in wishlisted for product_id in product_ids}}), 200
     
     def remove_from_wishlist(self):
         wishlist = db.wishlist.find_one({'userId': self.user_id})
@@ -51,4 +58,43 @@ class Wishlist:
 
         if wishlist:
             return jsonify({'wishlist': wishlist}), 200
-        return jsonify({'wishlist': []}), 404
\ No newline at end of file
+        return jsonify({'wishlist': []}), 404
+
+    def get_hydrated_wish_list(self, page=1, limit=20):
+        """
+        Returns one page of wishlist products, in wishlist order, with the fields the
+        wishlist grid displays. The page is sliced and joined to products in a single aggregation.
+        """
+        skip = (max(page, 1) - 1) * limit
+        wishlist = next(db.wishlist.aggregate([
+            {'$match': {'userId': self.user_id}},
+            {'$project': {
+                'total': {'$size': {'$ifNull': ['$products', []]}},
+                'productIds': {'$slice': [{'$ifNull': ['$products', []]}, skip, limit + 1]}
+            }},
+            {'$lookup': {
+                'from': 'products',
+                'localField': 'productIds',
+                'foreignField': '_id',
+                'pipeline': [{'$project': {field: 1 for field in self.PRODUCT_FIELDS}}],
+                'as': 'products'
+            }}
+        ]), None)
+
+        if not wishlist:
+            return jsonify({'products': [], 'total_pages': 0, 'next_page_available': False}), 200
+
+        products = {product['_id']: product for product in wishlist['products']}
+        page_products = []
+        for product_id in wishlist['productIds'][:limit]:
+            product = products.get(product_id)
+            if product:
+                product['average_rating'] = Review.get_average_rating(product)
+                product.pop('rating_sum', None)
+                page_products.append(product)
+
+        return jsonify({
+            'products': page_products,
+            'total_pages': math.ceil(wishlist['total'] / limit),
+            'next_page_available': len(wishlist['productIds']) > limit
+        }), 200
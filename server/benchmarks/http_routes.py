@@ -0,0 +1,538 @@
+"""
+HTTP benchmark for every route of app/routes/routes.py.
+
+The routes blueprint is served by Flask's test client. It runs against a
+dedicated database, on a local mongod or on mongomock in memory, and against
+fakeredis, so the benchmark needs neither network access nor the shared Redis.
+The database is dropped and seeded again from --seed with the requested
+volumes, so two runs with the same arguments see the same data.
+
+Each route is measured in two modes:
+    cold    Redis is flushed and every in-process cache cleared before each request
+    warm    read routes cycle through --warm-keys argument sets, all primed before
+            measuring; write routes are measured after one priming request
+
+Requests are sent one at a time. The report gives p50/p95/p99 latencies, in
+ms, and the throughput of one worker, in requests per second. Responses with
+a 4xx or 5xx status are counted as errors. Results are compared with the
+baseline file. A route regresses when its p95 exceeds the baseline p95 by more
+than --threshold and by more than --noise-ms. Routes with errors are left out
+of the comparison. The exit status is 1 on any regression or error.
+--save-baseline stores the current run as the new baseline.
+
+mongomock does not implement $text search, $lookup pipelines or the date
+operators the dashboard rollups use, so those routes report errors there:
+use a local mongod for baselines. The on-disk image variants cache is not
+cleared between cold requests.
+
+Requires fakeredis, plus mongomock for --mongo mongomock (pip install fakeredis mongomock).
+
+Usage (from the server directory):
+    python benchmarks/http_routes.py --mongo-uri mongodb://localhost:27017 --save-baseline
+    python benchmarks/http_routes.py --mongo-uri mongodb://localhost:27017 --routes wish_list,admin/get_orders
+    python benchmarks/http_routes.py --mongo mongomock --requests 50 --modes warm
+"""
+
+import argparse
+import functools
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines', 'http_routes.json')
+MODES = ('cold', 'warm')
+PASSWORD = 'benchmark-password'
+CATEGORIES = [
+    'smartphones', 'laptops', 'fragrances', 'skincare', 'groceries', 'home-decoration', 'furniture',
+    'tops', 'womens-dresses', 'womens-shoes', 'mens-shirts', 'mens-shoes', 'mens-watches',
+    'womens-watches', 'womens-bags', 'womens-jewellery', 'sunglasses', 'automotive', 'motorcycle', 'lighting'
+]
+BRANDS = ['Apple', 'Samsung', 'Huawei', 'Dell', 'HP', 'Lenovo', 'Sony', 'Nike', 'Adidas', 'Casio', 'Rolex', 'Ikea']
+NOUNS = ['Phone', 'Laptop', 'Perfume', 'Cream', 'Lamp', 'Chair', 'Shirt', 'Shoes', 'Watch', 'Bag', 'Ring', 'Glasses']
+STATUSES = ['Pending', 'Processing', 'Shipped', 'Fulfilled', 'Fulfilled', 'Fulfilled', 'Cancelled']
+SEARCH_TERMS = ['apple', 'watch', 'lamp', 'shoes']
+
+def connect_stand_ins(args):
+    """Points the app at the benchmark database and at fakeredis, must run before the app package is imported."""
+    os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ['MONGO_DATABASE'] = args.database
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    os.environ.setdefault('METRICS_TOKEN', 'benchmark-metrics-token')
+
+    import redis
+    import fakeredis
+    redis.Redis = functools.partial(fakeredis.FakeRedis, server=fakeredis.FakeServer())
+
+    if args.mongo == 'mongomock':
+        import pymongo
+        import mongomock
+        # The pool and monitoring options are pymongo only
+        pymongo.MongoClient = lambda uri, **options: mongomock.MongoClient(uri)
+
+def load_app(upload_folder):
+    import app
+    app.app.config['UPLOAD_FOLDER'] = upload_folder
+
+    from flask import Flask
+    from app.routes.routes import routes
+
+    bench_app = Flask(__name__)
+    bench_app.register_blueprint(routes)
+    return bench_app
+
+def make_image(width, height, seed, image_format='JPEG'):
+    from PIL import Image
+
+    image = Image.new('RGB', (width, height), ((seed * 37) % 256, (seed * 71) % 256, (seed * 113) % 256))
+    for x in range(0, width, 16):
+        for y in range(0, height, 16):
+            image.putpixel((x, y), ((x * seed) % 256, (y * seed) % 256, (x + y) % 256))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, quality=85)
+    return buffer.getvalue()
+
+class BenchmarkData:
+    """Seeds the benchmark database and hands out request arguments, all derived from one seed."""
+
+    def __init__(self, db, seed, upload_folder) -> None:
+        self.db = db
+        self.rng = random.Random(seed)
+        self.upload_folder = upload_folder
+        self.product_ids = []
+        self.user_emails = []
+        self.user_order_ids = []
+        self.order_ids = []
+        self.image_path = None
+        self.user = None
+        self.admin = None
+        self.counter = itertools.count()
+
+    def uid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def pick(self, values):
+        return self.rng.choice(values)
+
+    def insert(self, collection, documents, batch_size=1000):
+        for start in range(0, len(documents), batch_size):
+            collection.insert_many(documents[start:start + batch_size], ordered=False)
+
+    def seed(self, products, users, orders, reviews, user_orders, wishlist_size):
+        from app.auth.hasher import hash_password
+        from app.auth import password_hasher
+
+        for name in self.db.list_collection_names():
+            self.db.drop_collection(name)
+
+        self.image_path = os.path.join(self.upload_folder, 'benchmark.jpg')
+        with open(self.image_path, 'wb') as image_file:
+            image_file.write(make_image(1200, 800, 1))
+        image_url = 'http://localhost:8000/api/v1/get_image?filepath=' + self.image_path
+
+        product_docs = []
+        for i in range(products):
+            brand, noun, category = self.pick(BRANDS), self.pick(NOUNS), self.pick(CATEGORIES)
+            product_docs.append({
+                '_id': self.uid(),
+                'title': f'{brand} {noun} {i}',
+                'brand': brand,
+                'category': category,
+                'description': f'{brand} {noun.lower()} from the {category} range, model {i}',
+                'price': round(self.rng.uniform(5, 2000), 2),
+                'discount_percentage': round(self.rng.uniform(0, 30), 2),
+                'stock': self.rng.randint(1000, 5000),
+                'thumbnail': image_url,
+                'images': [image_url] * 3,
+                'review_count': 0,
+                'rating_sum': 0,
+                'created_timestamp': int(datetime.utcnow().timestamp()) - products + i
+            })
+        self.product_ids = [product['_id'] for product in product_docs]
+
+        review_docs = []
+        products_by_id = {product['_id']: product for product in product_docs}
+        for _ in range(reviews):
+            product = products_by_id[self.pick(self.product_ids)]
+            rating = self.rng.randint(1, 5)
+            product['review_count'] += 1
+            product['rating_sum'] += rating
+            review_docs.append({
+                '_id': self.uid(),
+                'productId': product['_id'],
+                'rating': rating,
+                'comment': 'Benchmark review',
+                'reviewerName': 'Benchmark',
+                'reviewerEmail': 'reviewer@benchmark.local',
+                'created_timestamp': int(datetime.utcnow().timestamp())
+            })
+
+        password = hash_password(PASSWORD.encode('utf-8'), password_hasher.rounds).decode('utf-8')
+        now = int(datetime.utcnow().timestamp())
+        user_docs = [{
+            '_id': self.uid(),
+            'name': f'User {i}',
+            'email': f'user{i}@benchmark.local',
+            'password': password,
+            'user_is_admin': i == 1,
+            'user_account_is_active': True,
+            'user_email_verified': True,
+            'account_created_timestamp': now,
+            'last_login_timestamp': now
+        } for i in range(max(users, 2))]
+        self.user, self.admin = user_docs[0], user_docs[1]
+        self.user_emails = [user['email'] for user in user_docs]
+
+        today = datetime.utcnow()
+        order_docs = []
+        for i in range(orders + user_orders):
+            user = self.user if i < user_orders else self.pick(user_docs)
+            items = [{
+                '_id': product['_id'],
+                'title': product['title'],
+                'price': product['price'],
+                'thumbnail': product['thumbnail'],
+                'quantity': self.rng.randint(1, 3)
+            } for product in (products_by_id[self.pick(self.product_ids)] for _ in range(self.rng.randint(1, 4)))]
+            order_docs.append({
+                '_id': self.uid(),
+                'userId': user['_id'],
+                'email': user['email'],
+                'status': self.pick(STATUSES),
+                'total': round(sum(item['price'] * item['quantity'] for item in items), 2),
+                'date': today - timedelta(seconds=self.rng.randint(0, 365 * 24 * 3600)),
+                'items': items
+            })
+        self.user_order_ids = [order['_id'] for order in order_docs[:user_orders]]
+        self.order_ids = [order['_id'] for order in order_docs]
+
+        wishlist_docs = [{
+            '_id': self.uid(),
+            'userId': user['_id'],
+            'products': self.rng.sample(self.product_ids, min(wishlist_size if user is self.user else 5, len(self.product_ids)))
+        } for user in user_docs]
+
+        self.insert(self.db.products, product_docs)
+        self.insert(self.db.reviews, review_docs)
+        self.insert(self.db.users, user_docs)
+        self.insert(self.db.orders, order_docs)
+        self.insert(self.db.wishlist, wishlist_docs)
+
+        from app.db.indexes import IndexRegistry
+        from app.dashboard.stats import DashboardStats
+        IndexRegistry.apply()
+        try:
+            DashboardStats.rebuild()
+        except Exception as e:
+            print(f"Could not build the dashboard stats: {e}")
+
+    def headers(self, user):
+        from app import jwt
+        from app.auth import secret_key
+
+        token = jwt.encode({
+            'id': user['_id'],
+            'email': user['email'],
+            'user_is_admin': user.get('user_is_admin', False),
+            'user_account_is_active': True,
+            'exp': datetime.utcnow() + timedelta(hours=12)
+        }, secret_key, algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def new_user(self):
+        """Inserts a throwaway account, for the routes that delete it."""
+        i = next(self.counter)
+        user = {
+            '_id': self.uid(), 'name': f'Disposable {i}', 'email': f'disposable{i}@benchmark.local',
+            'user_account_is_active': True, 'account_created_timestamp': int(datetime.utcnow().timestamp())
+        }
+        self.db.users.insert_one(user)
+        return user
+
+    def new_product(self):
+        product = {
+            '_id': self.uid(), 'title': 'Disposable product', 'category': self.pick(CATEGORIES), 'price': 10, 'stock': 10,
+            'created_timestamp': int(datetime.utcnow().timestamp())
+        }
+        self.db.products.insert_one(product)
+        return product['_id']
+
+    def order(self):
+        items = [{'_id': product_id, 'quantity': 1, 'price': 10} for product_id in self.rng.sample(self.product_ids, 2)]
+        return {
+            'userId': self.user['_id'],
+            'email': self.user['email'],
+            'status': 'Pending',
+            'total': 20,
+            'items': items
+        }
+
+    def product_ids_arg(self, count=20):
+        return ','.join(self.rng.sample(self.product_ids, min(count, len(self.product_ids))))
+
+    def wishlisted_product(self):
+        product_id = self.pick(self.product_ids)
+        self.db.wishlist.update_one({'userId': self.user['_id']}, {'$addToSet': {'products': product_id}})
+        return product_id
+
+    def upload(self):
+        image = make_image(640, 480, next(self.counter))
+        return {'data': {'file': (io.BytesIO(image), 'benchmark.jpg')}, 'content_type': 'multipart/form-data'}
+
+class Route:
+    def __init__(self, method, path, prepare=None, label=None, weight=1.0) -> None:
+        self.method = method
+        self.path = path
+        self.prepare = prepare or (lambda: {})
+        self.label = label
+        self.weight = weight
+
+    @property
+    def name(self):
+        return f"{self.method} {self.path}" + (f" [{self.label}]" if self.label else '')
+
+def build_routes(data):
+    """One entry per route and query variant, prepare returns the test client arguments of a single request."""
+    user = data.headers(data.user)
+    admin = data.headers(data.admin)
+    page = lambda: data.rng.randint(1, 5)
+
+    return [
+        Route('GET', '/metrics', lambda: {'headers': {'Authorization': f"Bearer {os.environ['METRICS_TOKEN']}"}}),
+        Route('POST', '/api/v1/validate_email', lambda: {'json': {'email': data.pick(data.user_emails)}}),
+        Route('POST', '/api/v1/signin', lambda: {'json': {'email': data.user['email'], 'password': PASSWORD}}, weight=0.25),
+        Route('POST', '/api/v1/signup', lambda: {'json': {
+            'name': 'New user', 'email': f'signup{next(data.counter)}@benchmark.local',
+            'password': PASSWORD, 'repeat_password': PASSWORD
+        }}, weight=0.25),
+        Route('GET', '/api/v1/user', lambda: {'headers': user}),
+        Route('PUT', '/api/v1/update_user', lambda: {'headers': user, 'json': {'name': f'User {next(data.counter)}'}}),
+        Route('DELETE', '/api/v1/delete_user', lambda: {'headers': data.headers(data.new_user())}),
+        Route('GET', '/api/v1/products', lambda: {'query_string': {'page': page()}}, label='page'),
+        Route('GET', '/api/v1/products', lambda: {'query_string': {'category': data.pick(CATEGORIES)}}, label='category'),
+        Route('GET', '/api/v1/products', lambda: {'query_string': {'productId': data.pick(data.product_ids)}}, label='detail'),
+        Route('POST', '/api/v1/products/add_review', lambda: {'headers': user, 'json': {
+            'productId': data.pick(data.product_ids), 'rating': data.rng.randint(1, 5),
+            'comment': 'Benchmark review', 'reviewerName': 'User 0', 'reviewerEmail': data.user['email']
+        }}),
+        Route('POST', '/api/v1/add_order', lambda: {'headers': user, 'json': data.order()}),
+        Route('GET', '/api/v1/get_orders', lambda: {'headers': user, 'query_string': {'page': page()}}, label='page'),
+        Route('GET', '/api/v1/get_orders', lambda: {'headers': user, 'query_string': {'orderId': data.pick(data.user_order_ids)}}, label='detail'),
+        Route('GET', '/api/v1/user_order_validation', lambda: {'headers': user, 'query_string': {'productId': data.pick(data.product_ids)}}),
+        Route('GET', '/api/v1/user_orders_validation', lambda: {'headers': user, 'query_string': {'productIds': data.product_ids_arg()}}),
+        Route('PUT', '/api/v1/cancel_order', lambda: {'headers': user, 'json': {'orderId': data.pick(data.user_order_ids)}}),
+        Route('GET', '/api/v1/get_wish_list', lambda: {'headers': user}),
+        Route('GET', '/api/v1/get_wish_list', lambda: {'headers': user, 'query_string': {'hydrate': 'true', 'page': 1, 'limit': 20}}, label='hydrate'),
+        Route('POST', '/api/v1/add_to_wishlist', lambda: {'headers': user, 'json': {'userId': data.user['_id'], 'productId': data.pick(data.product_ids)}}),
+        Route('GET', '/api/v1/product_in_wish_list', lambda: {'headers': user, 'query_string': {'productId': data.pick(data.product_ids)}}),
+        Route('GET', '/api/v1/products_in_wish_list', lambda: {'headers': user, 'query_string': {'productIds': data.product_ids_arg()}}),
+        Route('POST', '/api/v1/remove_from_wishList', lambda: {'headers': user, 'json': {'userId': data.user['_id'], 'productId': data.wishlisted_product()}}),
+        Route('POST', '/api/v1/upload', lambda: {'headers': admin, **data.upload()}, weight=0.25),
+        Route('GET', '/api/v1/get_image', lambda: {'query_string': {'filepath': data.image_path}}, label='original'),
+        Route('GET', '/api/v1/get_image', lambda: {'query_string': {'filepath': data.image_path, 'w': 320, 'format': 'webp'}}, label='variant'),
+        Route('GET', '/api/v1/admin/get_dashboard_data', lambda: {'headers': admin}),
+        Route('GET', '/api/v1/admin/get_sales', lambda: {'headers': admin, 'query_string': {
+            'from': (datetime.utcnow() - timedelta(days=90)).strftime('%Y-%m-%d'), 'granularity': 'week'
+        }}),
+        Route('GET', '/api/v1/admin/account_cache_stats', lambda: {'headers': admin}),
+        Route('GET', '/api/v1/admin/db_pool_stats', lambda: {'headers': admin}),
+        Route('GET', '/api/v1/admin/get_all_users', lambda: {'headers': admin, 'query_string': {'page': page()}}, label='page'),
+        Route('GET', '/api/v1/admin/get_all_users', lambda: {'headers': admin, 'query_string': {'searchTerm': 'user1'}}, label='search'),
+        Route('PUT', '/api/v1/admin/update_user', lambda: {'headers': admin, 'json': {
+            'email': data.pick(data.user_emails[2:] or data.user_emails), 'user_account_is_active': True
+        }}),
+        Route('POST', '/api/v1/admin/add_product', lambda: {'headers': admin, 'json': {
+            'title': 'Benchmark product', 'brand': data.pick(BRANDS), 'category': data.pick(CATEGORIES), 'price': 10, 'stock': 100
+        }}),
+        Route('GET', '/api/v1/admin/get_products', lambda: {'headers': admin, 'query_string': {'page': page()}}, label='page'),
+        Route('GET', '/api/v1/admin/get_products', lambda: {'headers': admin, 'query_string': {'searchTerm': data.pick(SEARCH_TERMS)}}, label='search'),
+        Route('PUT', '/api/v1/admin/update_product', lambda: {'headers': admin, 'json': {
+            '_id': data.pick(data.product_ids), 'discount_percentage': round(data.rng.uniform(0, 30), 2)
+        }}),
+        Route('DELETE', '/api/v1/admin/delete_product', lambda: {'headers': admin, 'query_string': {'productId': data.new_product()}}),
+        Route('GET', '/api/v1/admin/get_orders', lambda: {'headers': admin, 'query_string': {'page': page()}}, label='page'),
+        Route('GET', '/api/v1/admin/get_orders', lambda: {'headers': admin, 'query_string': {'searchTerm': 'user1'}}, label='search'),
+        Route('PUT', '/api/v1/admin/update_order', lambda: {'headers': admin, 'json': {
+            'orderId': data.pick(data.order_ids), 'status': data.pick(STATUSES)
+        }})
+    ]
+
+def reset_caches(redis_client):
+    from app.utils.TwoTierCache import TwoTierCache
+    from app.product import product_summary_cache
+
+    redis_client.flushall()
+    for cache in TwoTierCache.instances.values():
+        cache.local.clear()
+    product_summary_cache.clear()
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list."""
+    return samples[max(0, math.ceil(pct / 100 * len(samples)) - 1)]
+
+def measure(client, route, mode, requests, redis_client, warm_keys):
+    """
+    In warm mode, read routes cycle through warm_keys argument sets which are all primed
+    before measuring, write routes get fresh arguments after a single priming request.
+    """
+    latencies = []
+    errors = 0
+
+    arguments = None
+    if mode == 'warm':
+        reset_caches(redis_client)
+        if route.method == 'GET':
+            arguments = [route.prepare() for _ in range(warm_keys)]
+            for kwargs in arguments:
+                client.open(route.path, method=route.method, **kwargs)
+        else:
+            client.open(route.path, method=route.method, **route.prepare())
+
+    for i in range(requests):
+        kwargs = arguments[i % len(arguments)] if arguments else route.prepare()
+        if mode == 'cold':
+            reset_caches(redis_client)
+
+        started = time.perf_counter()
+        response = client.open(route.path, method=route.method, **kwargs)
+        response.get_data()
+        latencies.append(time.perf_counter() - started)
+
+        if response.status_code >= 400:
+            errors += 1
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_rps': round(requests / sum(latencies), 1)
+    }
+
+def compare(results, baseline, threshold, noise_ms):
+    """
+    Returns {key: baseline p95} for the results whose p95 regressed. Results with errors
+    are left out, a route failing fast would otherwise look faster.
+    """
+    regressions = {}
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous or result['errors'] or previous.get('errors'):
+            continue
+        if result['p95_ms'] > previous['p95_ms'] * (1 + threshold) and result['p95_ms'] - previous['p95_ms'] > noise_ms:
+            regressions[key] = previous['p95_ms']
+    return regressions
+
+def print_report(results, baseline):
+    print(f"{'route':<58} {'mode':<5} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'errors':>6} {'p95 vs baseline':>16}")
+    for key, result in results.items():
+        name, mode = key.rsplit(' ', 1)
+        previous = baseline.get(key)
+        change = f"{(result['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%" if previous and previous['p95_ms'] else '-'
+        print(
+            f"{name:<58} {mode:<5} {result['requests']:>5} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['throughput_rps']:>9.1f} {result['errors']:>6} {change:>16}"
+        )
+
+def load_baseline(path):
+    if not os.path.isfile(path):
+        return {}, {}
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    return baseline.get('environment', {}), baseline.get('results', {})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo', choices=['mongod', 'mongomock'], default='mongod')
+    parser.add_argument('--mongo-uri', default=os.environ.get('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--database', default='benchmark', help='dropped and seeded again on every run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--user-orders', type=int, default=100, help='orders of the benchmark user')
+    parser.add_argument('--wishlist-size', type=int, default=50, help='wishlist length of the benchmark user')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route and mode')
+    parser.add_argument('--warm-keys', type=int, default=10, help='distinct primed argument sets per read route in warm mode')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--routes', default=None, help='comma separated substrings, only the matching routes run')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 increase over the baseline, 0.2 is 20%%')
+    parser.add_argument('--noise-ms', type=float, default=1.0, help='p95 increases below this are never regressions')
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(',') if mode in MODES]
+    if not modes:
+        parser.error(f"--modes must list some of {', '.join(MODES)}")
+
+    upload_folder = tempfile.mkdtemp(prefix='benchmark-uploads-')
+    connect_stand_ins(args)
+    bench_app = load_app(upload_folder)
+
+    from app import db, redis_client
+
+    data = BenchmarkData(db, args.seed, upload_folder)
+    started = time.perf_counter()
+    data.seed(args.products, args.users, args.orders, args.reviews, args.user_orders, args.wishlist_size)
+    print(f"Seeded {args.database} in {time.perf_counter() - started:.1f}s")
+
+    routes = build_routes(data)
+    if args.routes:
+        filters = [route_filter.strip() for route_filter in args.routes.split(',') if route_filter.strip()]
+        routes = [route for route in routes if any(route_filter in route.name for route_filter in filters)]
+
+    results = {}
+    with bench_app.test_client() as client:
+        for route in routes:
+            for mode in modes:
+                requests = max(5, int(args.requests * route.weight))
+                results[f"{route.name} {mode}"] = measure(client, route, mode, requests, redis_client, max(1, args.warm_keys))
+
+    environment = {
+        'mongo': args.mongo,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'products': args.products,
+        'users': args.users,
+        'orders': args.orders,
+        'reviews': args.reviews
+    }
+    baseline_environment, baseline = load_baseline(args.baseline)
+    if baseline and baseline_environment != environment:
+        print(f"Warning: the baseline was recorded with {baseline_environment}, this run uses {environment}")
+
+    print_report(results, baseline)
+
+    regressions = compare(results, baseline, args.threshold, args.noise_ms)
+    for key, previous_p95 in regressions.items():
+        print(f"REGRESSION {key}: p95 {results[key]['p95_ms']:.2f} ms, baseline {previous_p95:.2f} ms")
+
+    failed = [key for key, result in results.items() if result['errors']]
+    if failed:
+        print(f"{len(failed)} route(s) answered with errors: {', '.join(failed)}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump({'environment': environment, 'results': results}, baseline_file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+
+    return 1 if regressions or failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+Concurrency benchmark for the stock reservation used by Order.add_order.
+
+Many workers order the same product at once, against a local mongod. The
+script reports order throughput and checks that the product was never
+oversold. For comparison, --mode legacy runs the previous read-then-$set
+implementation, which loses updates under contention.
+
+Usage (from the server directory):
+    python benchmarks/order_stock.py --mongo-uri mongodb://localhost:27017 --workers 32 --orders 5000 --stock 1000
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient
+
+# app.order.stock is loaded by path: importing the app package connects to the configured Atlas cluster.
+STOCK_MODULE_PATH = os.path.join(os.path.dirname(__file__), '..', 'app', 'order', 'stock.py')
+spec = importlib.util.spec_from_file_location('order_stock', STOCK_MODULE_PATH)
+stock = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(stock)
+
+def place_order_conditional(products, product_id, quantity):
+    return not stock.reserve_stock(products, {product_id: quantity})
+
+def place_order_legacy(products, product_id, quantity):
+    product = products.find_one({'_id': product_id})
+    if not product or int(product['stock']) < quantity:
+        return False
+    products.update_one({'_id': product_id}, {'$set': {'stock': int(product['stock']) - quantity}})
+    return True
+
+def run(products, mode, workers, orders, initial_stock, quantity):
+    product_id = str(uuid.uuid4())
+    products.insert_one({'_id': product_id, 'title': 'Benchmark product', 'stock': initial_stock})
+
+    place_order = place_order_conditional if mode == 'conditional' else place_order_legacy
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda _: place_order(products, product_id, quantity), range(orders)))
+    elapsed = time.perf_counter() - started
+
+    accepted = sum(results)
+    final_stock = products.find_one({'_id': product_id})['stock']
+    expected_stock = initial_stock - accepted * quantity
+    products.delete_one({'_id': product_id})
+
+    print(f"[{mode}] workers={workers} orders={orders} elapsed={elapsed:.3f}s throughput={orders / elapsed:.1f} orders/s")
+    print(f"[{mode}] accepted={accepted} rejected={orders - accepted} final_stock={final_stock} expected_stock={expected_stock}")
+
+    oversold = accepted * quantity > initial_stock or final_stock != expected_stock or final_stock < 0
+    if oversold:
+        print(f"[{mode}] OVERSOLD: {accepted * quantity} units accepted for {initial_stock} in stock")
+    return not oversold
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=os.environ.get('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--database', default='benchmark')
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--quantity', type=int, default=1)
+    parser.add_argument('--mode', choices=['conditional', 'legacy', 'both'], default='both')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri, maxPoolSize=args.workers)
+    products = client[args.database].products
+
+    modes = ['conditional', 'legacy'] if args.mode == 'both' else [args.mode]
+    results = {mode: run(products, mode, args.workers, args.orders, args.stock, args.quantity) for mode in modes}
+
+    return 0 if results.get('conditional', True) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
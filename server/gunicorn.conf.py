@@ -0,0 +1,34 @@
+"""
+Production server settings, picked up by `gunicorn server:app` from the server directory.
+
+Every worker is a single process running gevent greenlets, so it can hold
+thousands of Socket.IO connections next to the REST routes. Each worker runs its own
+change-stream watchers and only emits to its own clients, which is why no Socket.IO
+message queue is needed. With more than one worker, the load balancer has to use sticky
+sessions (e.g. nginx ip_hash) so that Socket.IO long-polling requests reach the same worker.
+"""
+
+import os
+
+# The app reads SOCKETIO_ASYNC_MODE when it is loaded, and defaults to threading outside gunicorn
+os.environ['SOCKETIO_ASYNC_MODE'] = 'gevent'
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 5000))
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+def child_exit(server, worker):
+    """Drops the live gauges of a dead worker when metrics are aggregated across processes."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+def post_worker_init(worker):
+    """Starts the watchers as cooperative tasks once the worker has loaded the app."""
+    from server import start_background_tasks
+    start_background_tasks()
@@ -4,72 +4,102 @@ It includes a MongoDB watcher for order updates and socket events for order mana
 """
 
 import os
-from threading import Thread
-from flask import Flask, send_from_directory
+from flask import Flask, request, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from pymongo.errors import PyMongoError
 from socketio.exceptions import ConnectionError as SocketIOConnectionError
 from app.routes.routes import routes
-from app import db
+from app import db, redis_client
 from app.order.order import Order
-from app.user.user import User
+from app.order.subscriptions import OrderSubscriptions
+from app.product.product import Product
+from app.db.indexes import IndexRegistry
+from app.dashboard.stats import DashboardStats
+from app.utils.TwoTierCache import TwoTierCache
+from app.metrics.metrics import SOCKETIO_CONNECTIONS, SOCKETIO_CONNECTS, SOCKETIO_EMITS
 
 app = Flask(__name__, static_folder='dist')
 CORS(app, origins=['http://localhost:8000'])
-socketio = SocketIO(app, cors_allowed_origins="http://localhost:8000")
+socketio = SocketIO(app, cors_allowed_origins="http://localhost:8000", async_mode=os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'))
 
 app.register_blueprint(routes)
 
-GLOBAL_USER_ID = None
-GLOBAL_ORDER_ID = None
-GLOBAL_PAGE = None
+order_subscriptions = OrderSubscriptions()
 
-def watch_orders_update():
-    global GLOBAL_USER_ID, GLOBAL_ORDER_ID
+def watch_orders():
+    """
+    Single change-stream dispatcher for the orders collection. Updates are only
+    routed to the rooms of clients following that order, inserts to the order list subscribers.
+    """
     try:
         with db.orders.watch() as stream:
             for change in stream:
-                if change['operationType'] == 'update':
-                    updated_document_id = change['documentKey']['_id']
-                    if updated_document_id == GLOBAL_ORDER_ID:
-                        updated_document = Order.get_order_updates({'userId': GLOBAL_USER_ID, 'orderId': updated_document_id})
-                        if updated_document.get('userId') == GLOBAL_USER_ID or User.user_is_admin(userId = GLOBAL_USER_ID):
-                            socketio.emit('order_updated', updated_document)
+                # Emitted payloads are serialized by the app's JSON provider, which needs an app context
+                with app.app_context():
+                    if change['operationType'] == 'update':
+                        dispatch_order_update(change['documentKey']['_id'])
+                    elif change['operationType'] == 'insert':
+                        dispatch_new_order()
     except PyMongoError as e:
         print(f"MongoDB error: {e}")
 
-def watch_new_orders():
+def watch_products():
+    """Keeps the process-local product summaries used to hydrate order items in sync with product writes."""
     try:
-        with db.orders.watch() as stream:
+        with db.products.watch([{'$match': {'operationType': {'$in': ['update', 'replace', 'delete']}}}]) as stream:
             for change in stream:
-                if change['operationType'] == 'insert':
-                    orders_data = Order.get_all_orders(search_term=None, page=GLOBAL_PAGE)
-                    socketio.emit('orders', orders_data)
+                Product.invalidate_product_summary(change)
     except PyMongoError as e:
         print(f"MongoDB error: {e}")
 
+def dispatch_order_update(order_id):
+    if not order_subscriptions.has_order_subscribers(order_id):
+        return
+
+    updated_document = Order.get_order_details(order_id)
+    if updated_document:
+        socketio.emit('order_updated', updated_document, to=OrderSubscriptions.order_room(order_id))
+        SOCKETIO_EMITS.labels('order_updated').inc()
+
+def dispatch_new_order():
+    for (search_term, page), sids in order_subscriptions.order_list_groups().items():
+        orders_data = Order.get_all_orders(search_term=search_term, page=page)
+        for sid in sids:
+            socketio.emit('orders', orders_data, to=sid)
+            SOCKETIO_EMITS.labels('orders').inc()
+
 @socketio.on('connect')
 def handle_connect():
     """Handles client connection events."""
+    SOCKETIO_CONNECTS.inc()
+    SOCKETIO_CONNECTIONS.inc()
     print('Client connected')
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handles client disconnection events."""
+    order_subscriptions.unsubscribe(request.sid)
+    SOCKETIO_CONNECTIONS.dec()
     print('Client disconnected')
 
 @socketio.on('get_order_details')
 def handle_get_order_details(data):
     """
-    Handles requests for order details and emits the order details back to the client.
+    Handles requests for order details, joins the client to the order's room
+    and emits the order details back to the client.
     """
     try:
-        global GLOBAL_USER_ID, GLOBAL_ORDER_ID
-        GLOBAL_USER_ID = data.get('userId', None)
-        GLOBAL_ORDER_ID = data.get('orderId', None)
+        order_id = data.get('orderId', None)
         order = Order.get_order_updates(data)
-        socketio.emit('order_details', order)
+
+        if 'error' not in order:
+            for previous_order_id in order_subscriptions.subscribe_order(request.sid, order_id):
+                leave_room(OrderSubscriptions.order_room(previous_order_id))
+            join_room(OrderSubscriptions.order_room(order_id))
+
+        emit('order_details', order)
+        SOCKETIO_EMITS.labels('order_details').inc()
     except PyMongoError as e:
         print(f"MongoDB error retrieving order details: {e}")
     except SocketIOConnectionError as e:
@@ -81,11 +111,12 @@ def handle_get_orders(data):
     Handles requests for order details and emits the order details back to the client.
     """
     try:
-        global GLOBAL_PAGE
-        GLOBAL_PAGE = data.get('page', None)
+        page = data.get('page', None)
         search_term = data.get('searchTerm', None)
-        order = Order.get_all_orders(search_term=search_term, page=GLOBAL_PAGE)
-        socketio.emit('orders', order)
+        order_subscriptions.subscribe_order_list(request.sid, search_term, page)
+        order = Order.get_all_orders(search_term=search_term, page=page)
+        emit('orders', order)
+        SOCKETIO_EMITS.labels('orders').inc()
     except PyMongoError as e:
         print(f"MongoDB error retrieving order details: {e}")
     except SocketIOConnectionError as e:
@@ -103,14 +134,38 @@ def serve(path):
     else:
         return send_from_directory(app.static_folder, 'index.html')
     
-def start_threads():
-    watch_orders_update_thread = Thread(target=watch_orders_update)
-    watch_new_orders_thread = Thread(target=watch_new_orders)
+def ensure_indexes():
+    try:
+        IndexRegistry.apply()
+    except PyMongoError as e:
+        print(f"MongoDB error creating indexes: {e}")
+
+def build_dashboard_stats():
+    try:
+        DashboardStats.ensure_built()
+    except PyMongoError as e:
+        print(f"MongoDB error building dashboard stats: {e}")
+
+background_tasks_started = False
 
-    watch_orders_update_thread.start()
-    watch_new_orders_thread.start()
+def start_background_tasks():
+    """
+    Starts the change-stream watchers, the cache invalidation listener and the
+    first build of the dashboard statistics as Socket.IO background tasks: OS
+    threads in development, greenlets under the gevent workers configured in
+    gunicorn.conf.py, which set SOCKETIO_ASYNC_MODE.
+    """
+    global background_tasks_started
+    if background_tasks_started:
+        return
+    background_tasks_started = True
 
-start_threads()
+    ensure_indexes()
+    socketio.start_background_task(build_dashboard_stats)
+    socketio.start_background_task(watch_orders)
+    socketio.start_background_task(watch_products)
+    socketio.start_background_task(TwoTierCache.listen, redis_client)
 
 if __name__ == '__main__':
+    start_background_tasks()
     socketio.run(app, debug=True, host='localhost', port=8000)
@@ -49,12 +49,15 @@ export const addOrder = (props: OrderProps): Promise<AxiosResponse> => axios.pos
 export const getUserOrders = (orderId?: string, page?: number): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/get_orders?orderId=${orderId}&page=${page}`, { headers })
 export const cancelUserOrder = (orderId: string): Promise<AxiosResponse> => axios.put(`${URI}/api/v1/cancel_order`, { orderId: orderId }, { headers })
 export const orderValidation = (productId: string): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/user_order_validation?productId=${productId}`, { headers })
+export const ordersValidation = (productIds: string[]): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/user_orders_validation?productIds=${productIds.map(encodeURIComponent).join(',')}`, { headers })
 
 // wishlist
 export const addToWishList = (props: WishListType): Promise<AxiosResponse> => axios.post(`${URI}` + '/api/v1/add_to_wishlist', props, { headers })
 export const productInWishList = (productId: string): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/product_in_wish_list?productId=${productId}`, { headers })
+export const productsInWishList = (productIds: string[]): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/products_in_wish_list?productIds=${productIds.map(encodeURIComponent).join(',')}`, { headers })
 export const removeFromWishList = (props: WishListType): Promise<AxiosResponse> => axios.post(`${URI}` + '/api/v1/remove_from_wishList', props, { headers })
 export const getWishList = (): Promise<AxiosResponse> => axios.get(`${URI}` + '/api/v1/get_wish_list', { headers })
+export const getHydratedWishList = (page: number, limit: number = 20): Promise<AxiosResponse> => axios.get(`${URI}` + `/api/v1/get_wish_list?hydrate=true&page=${page}&limit=${limit}`, { headers })
 
 // Image-Uplod
 export const uploadImage = (formData: FormData): 
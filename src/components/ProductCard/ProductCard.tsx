@@ -1,5 +1,6 @@
 import React from 'react'
 import { ProductCardProps } from '../../utils/types'
+import { thumbnailUrl } from '../../utils'
 
 const ProductCard: React.FC<ProductCardProps> = ({ product, category, addToCart }) => {
   const discountedPrice = product && (product?.price * (100 - product?.discount_percentage)) / 100
@@ -8,7 +9,7 @@ const ProductCard: React.FC<ProductCardProps> = ({ product, category, addToCart
     <div className="border rounded p-4 bg-white shadow-md">
       <a href={`/products/${category}/${product._id}`}>
         <img
-          src={product.thumbnail}
+          src={thumbnailUrl(product.thumbnail, 320)}
           alt={product.title}
           className="w-full h-48 object-cover mb-4"
         />
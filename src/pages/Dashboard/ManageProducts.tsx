@@ -8,6 +8,7 @@ import { useNavigate } from 'react-router-dom'
 import { Pagination } from '../../components'
 import { ProductProps } from '../../utils/types'
 import Loader from '../../utils/Loader'
+import { thumbnailUrl } from '../../utils'
 
 const ManageProducts: React.FC = () => {
   const [products, setProducts] = useState<ProductProps[] | null>(null)
@@ -88,7 +89,7 @@ const ManageProducts: React.FC = () => {
           <tbody className="bg-white divide-y divide-gray-200">
             {products?.map((product: ProductProps) => (
               <tr key={product._id}> 
-                <td className='px-6 py-4'><a href={'/products' + `/${product.category}` + `/${product._id}`}><img src={product.thumbnail} alt={product.title} className='w-12 h-12'/></a></td>
+                <td className='px-6 py-4'><a href={'/products' + `/${product.category}` + `/${product._id}`}><img src={thumbnailUrl(product.thumbnail, 64)} alt={product.title} className='w-12 h-12'/></a></td>
                 <td className="px-6 py-4">{product.title}</td>
                 <td className="px-6 py-4">{product.category}</td>
                 <td className="px-6 py-4">{product.stock}</td>
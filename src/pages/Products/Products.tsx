@@ -10,12 +10,18 @@ import {
 
 import { 
   AiFillStar, 
-  AiOutlineStar 
+  AiOutlineStar,
+  AiFillHeart
 } from 'react-icons/ai'
 
 import { useParams } from 'react-router-dom'
-import { getProductsByCategory } from '../../api'
-import { formatPrice } from '../../utils'
+import { 
+  token,
+  getProductsByCategory, 
+  productsInWishList, 
+  ordersValidation 
+} from '../../api'
+import { formatPrice, thumbnailUrl } from '../../utils'
 import Loader from '../../utils/Loader'
 
 const Products: React.FC<SearchTermProps> = ({ searchTerm }) => {
@@ -25,12 +31,28 @@ const Products: React.FC<SearchTermProps> = ({ searchTerm }) => {
   const [loadingMore, setLoadingMore] = useState<boolean>(false)
   const [page, setPage] = useState<number>(1)
   const [hasMorePages, setHasMorePages] = useState<boolean>(true)
+  const [wishListed, setWishListed] = useState<Record<string, boolean>>({})
+  const [purchased, setPurchased] = useState<Record<string, boolean>>({})
   const { category } = useParams<{ category?: string }>()
 
   useEffect(() => {
     document.title = category ? `${category.charAt(0).toUpperCase()}${category.slice(1)}` : "Products"
   }, [category])
 
+  // One batch request per loaded page for the wishlist and purchase badges
+  const fetchProductStatuses = async (productIds: string[]) => {
+    try {
+      const [wishListResponse, ordersResponse] = await Promise.all([
+        productsInWishList(productIds),
+        ordersValidation(productIds)
+      ])
+      setWishListed(prevWishListed => ({ ...prevWishListed, ...wishListResponse.data.products }))
+      setPurchased(prevPurchased => ({ ...prevPurchased, ...ordersResponse.data.products }))
+    } catch (error) {
+      console.error('Error fetching product statuses:', error)
+    }
+  }
+
   useEffect(() => {
     const fetchAllShoppingItems = async () => {
       if (!hasMorePages) return
@@ -43,6 +65,7 @@ const Products: React.FC<SearchTermProps> = ({ searchTerm }) => {
         if (data) {
           setAllProducts(prevProducts => [...prevProducts, ...data.data])
           setFilteredProducts(prevFiltered => prevFiltered ? [...prevFiltered, ...data.data] : data)
+          if (token && data.data?.length) fetchProductStatuses(data.data.map((product: ProductProps) => product._id))
         }
         setHasMorePages(data.nextPageAvailable)
       } catch (error) {
@@ -99,12 +122,18 @@ const Products: React.FC<SearchTermProps> = ({ searchTerm }) => {
               <div className='mx-auto w-full max-w-[600px]'>
                 <div className="w-full h-[300px]">
                   <img 
-                    src={product.thumbnail}
+                    src={thumbnailUrl(product.thumbnail, 640)}
                     alt='product image' 
                     className='w-full h-full object-contain' 
                   />
                 </div>
-                <h3 className='mt-3 text-center text-lg font-serif hover:text-gray-500 truncate w-[200px]'>{product.title}</h3>
+                <div className='mt-3 flex items-center justify-center space-x-2'>
+                  {wishListed[product._id] && <AiFillHeart className="text-red-500 shrink-0" title="In your wishlist" />}
+                  <h3 className='text-center text-lg font-serif hover:text-gray-500 truncate w-[200px]'>{product.title}</h3>
+                </div>
+                {purchased[product._id] && (
+                  <p className='mt-1 text-center text-xs text-green-600'>Purchased</p>
+                )}
                 <div className='flex items-center justify-center mt-4 space-x-2'>
                   {
                     [...Array(5)].map((_, i) => {
@@ -120,7 +149,7 @@ const Products: React.FC<SearchTermProps> = ({ searchTerm }) => {
                       );
                     })
                   }
-                  <span>({product.reviews.length})</span>
+                  <span>({product.review_count ?? product.reviews?.length ?? 0})</span>
                 </div>
                 <div className='flex items-center justify-center mt-4'>
                   <span className="flex flex-wrap font-bold">
@@ -3,10 +3,7 @@ import React, {
   useEffect 
 } from 'react'
 
-import { 
-  getWishList, 
-  getProductById 
-} from '../../api'
+import { getHydratedWishList } from '../../api'
 
 import { 
   WishListProps, 
@@ -19,37 +16,51 @@ import {
 } from 'react-icons/ai'
 
 import Loader from '../../utils/Loader'
+import { thumbnailUrl } from '../../utils'
 
 const WishList: React.FC<WishListProps> = ({ user }) => {
   const [wishListItems, setWishListItems] = useState<ProductProps[]>([])
-  const [loading, setLoading] = useState<boolean>(false)
+  const [loading, setLoading] = useState<boolean>(true)
+  const [loadingMore, setLoadingMore] = useState<boolean>(false)
+  const [page, setPage] = useState<number>(1)
+  const [hasMorePages, setHasMorePages] = useState<boolean>(true)
 
   document.title = `${user?.name}'s Wishlist`
 
   useEffect(() => {
     const fetchWishListItems = async () => {
-      setLoading(true)
+      if (!hasMorePages) return
+
+      if (page === 1) setLoading(true)
+      else setLoadingMore(true)
+
       try {
-        const { data } = await getWishList()
+        const { data } = await getHydratedWishList(page)
         if (data) {
-          const productDetails: ProductProps[] = await Promise.all(
-            data.wishlist.products.map((id: string) => 
-              getProductById(id, 1).then(res => res.data as ProductProps)
-            )
-          )
-
-          setWishListItems(currentItems => [...currentItems, ...productDetails])
+          setWishListItems(currentItems => [...currentItems, ...data.products])
+          setHasMorePages(data.next_page_available)
         }
       } catch {
         console.log('Wishlist Empty')
       }
       finally {
         setLoading(false)
+        setLoadingMore(false)
       }
     }
 
     fetchWishListItems()
-  }, [])
+  }, [page, hasMorePages])
+
+  useEffect(() => {
+    const handleScroll = () => {
+      if (window.innerHeight + document.documentElement.scrollTop !== document.documentElement.offsetHeight || !hasMorePages) return
+      setPage(prevPage => prevPage + 1)
+    }
+
+    window.addEventListener('scroll', handleScroll)
+    return () => window.removeEventListener('scroll', handleScroll)
+  }, [hasMorePages])
 
   if(loading) return <Loader className='flex flex-col justify-center items-center h-screen' />
 
@@ -73,7 +84,7 @@ const WishList: React.FC<WishListProps> = ({ user }) => {
               <div className='bg-white p-5 flex flex-col justify-center items-center'>
                 <div className="w-[200px] h-[300px] mx-auto bg-gray-100 p-2">
                   <img 
-                    src={items.thumbnail} 
+                    src={thumbnailUrl(items.thumbnail, 320)} 
                     alt='thumbnail'
                     className='w-full h-full object-contain' 
                   />
@@ -95,7 +106,7 @@ const WishList: React.FC<WishListProps> = ({ user }) => {
                         );
                       })
                     }
-                    <span>({items.reviews.length})</span>
+                    <span>({items.review_count ?? items.reviews?.length ?? 0})</span>
                   </div>
                 </div>
                 <div className="flex items-center justify-center mt-4">
@@ -110,6 +121,7 @@ const WishList: React.FC<WishListProps> = ({ user }) => {
             </a>
           ))}
         </div>
+        {loadingMore && <Loader className="flex justify-center items-center" />}
       </div>
     </section>
   )
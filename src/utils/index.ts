@@ -175,6 +175,11 @@ export const formatPrice = (price: number, discountPercentage: number, showOrigi
   return showOriginal ? `${formattedPrice} (Original: $${originalPrice})` : formattedPrice
 }
 
+export const thumbnailUrl = (url: string, width: number): string => {
+  if (!url || !url.includes('/api/v1/get_image')) return url
+  return `${url}&w=${width}&format=webp`
+}
+
 export const formatDate = (dateString: string) => {
   const monthNames = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
   const year = dateString.substring(0, 4)
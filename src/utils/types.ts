@@ -84,6 +84,7 @@ export type ProductType = {
   thumbnail: string
   average_rating?: string
   quantity?: number
+  review_count?: number
   reviews: Reviews[]
 }
 